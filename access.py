@@ -0,0 +1,46 @@
+import os
+
+from cache import LRUCache
+from storage import get_store
+
+# Admins can always use the bot and manage the allowlist. AUTHORIZED_USER_ID is
+# the original single-user setting; AUTHORIZED_USER_IDS adds more, comma separated.
+ADMIN_USER_IDS = {
+    int(user_id)
+    for user_id in [os.getenv("AUTHORIZED_USER_ID", "1234567890"), *os.getenv("AUTHORIZED_USER_IDS", "").split(",")]
+    if user_id.strip()
+}
+ALLOWLIST_CACHE_SIZE = int(os.getenv("ALLOWLIST_CACHE_SIZE", "10000"))
+# How long an allowlist change made by another worker takes to be seen here.
+ALLOWLIST_CACHE_TTL_SECONDS = float(os.getenv("ALLOWLIST_CACHE_TTL_SECONDS", "60"))
+
+# user_id -> bool. Refusals are cached too, so unknown users don't reach the database on every message.
+allowlist_cache = LRUCache(maxsize=ALLOWLIST_CACHE_SIZE, ttl=ALLOWLIST_CACHE_TTL_SECONDS)
+
+
+def is_admin(user_id: int) -> bool:
+    return user_id in ADMIN_USER_IDS
+
+
+async def is_authorized(user_id: int) -> bool:
+    """Return True if the user is an admin or on the allowlist kept in the store.
+
+    Lookups are cached for ALLOWLIST_CACHE_TTL_SECONDS.
+    """
+    if is_admin(user_id):
+        return True
+    allowed = allowlist_cache.get(user_id)
+    if allowed is None:
+        allowed = await get_store().is_user_allowed(user_id)
+        allowlist_cache.set(user_id, allowed)
+    return allowed
+
+
+async def set_allowed(user_id: int, allowed: bool) -> None:
+    """Add the user to the allowlist, or remove them from it.
+
+    Raises:
+        NotImplementedError: If the storage backend has no allowlist.
+    """
+    await get_store().set_user_allowed(user_id, allowed)
+    allowlist_cache.set(user_id, allowed)
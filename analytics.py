@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+
+from models import AnalyticsQuery
+from storage import get_store, to_datetime
+
+# How many accounts are listed in breakdowns sent to the LLM.
+TOP_ACCOUNTS = 5
+
+
+def _range(start: date = None, end: date = None) -> tuple:
+    """Convert an inclusive date range to the half-open datetime range stores take."""
+    return (
+        to_datetime(start) if start is not None else None,
+        to_datetime(end + timedelta(days=1)) if end is not None else None,
+    )
+
+
+async def _totals(user_id: int, start: date = None, end: date = None, account: str = None) -> dict:
+    return await get_store().totals(user_id, *_range(start, end), account=account)
+
+
+async def _spend_per_account(user_id: int, start: date = None, end: date = None) -> list:
+    return await get_store().spend_per_account(user_id, *_range(start, end), limit=TOP_ACCOUNTS)
+
+
+async def balance(user_id: int, start: date = None, end: date = None) -> dict:
+    """Balance overall, from the stored balance, or for a date range."""
+    if start is None and end is None:
+        return {"balance": await get_store().get_balance(user_id)}
+    totals = await _totals(user_id, start, end)
+    return {"balance": totals["total_income"] - totals["total_expenditure"], **totals}
+
+
+async def spend_on_date(user_id: int, day: date) -> dict:
+    """Total spending on a single day."""
+    totals = await _totals(user_id, day, day)
+    return {"date": day.isoformat(), "total_expenditure": totals["total_expenditure"], "transaction_count": totals["transaction_count"]}
+
+
+async def spend_by_account(user_id: int, account: str, start: date = None, end: date = None) -> dict:
+    """Total spending in one account, optionally within a date range."""
+    totals = await _totals(user_id, start, end, account)
+    return {"account": account, "total_expenditure": totals["total_expenditure"], "transaction_count": totals["transaction_count"]}
+
+
+async def top_account(user_id: int, start: date = None, end: date = None) -> dict:
+    """The accounts with the highest spending, highest first."""
+    return {"top_accounts": await _spend_per_account(user_id, start, end)}
+
+
+async def range_summary(user_id: int, start: date = None, end: date = None) -> dict:
+    """Income, spending and the biggest spending accounts within a date range."""
+    totals = await _totals(user_id, start, end)
+    return {
+        "balance": totals["total_income"] - totals["total_expenditure"],
+        **totals,
+        "top_accounts": await _spend_per_account(user_id, start, end),
+    }
+
+
+async def run_query(user_id: int, query: AnalyticsQuery) -> dict:
+    """Answer an analytics query from the stored transactions.
+
+    Args:
+        user_id: The Telegram user the query is about.
+        query: The query extracted from the user's message.
+
+    Returns:
+        A small dict of computed results for the LLM to phrase. The requested
+        period is included when one was given.
+    """
+    start, end = query.start_date, query.end_date
+    if query.query_type == "balance":
+        result = await balance(user_id, start, end)
+    elif query.query_type == "spend_on_date" and start is not None:
+        result = await spend_on_date(user_id, start)
+    elif query.query_type == "spend_by_account" and query.account is not None:
+        result = await spend_by_account(user_id, query.account, start, end)
+    elif query.query_type == "top_account":
+        result = await top_account(user_id, start, end)
+    elif query.query_type == "range_summary":
+        result = await range_summary(user_id, start, end)
+    else:
+        return {}
+
+    if start is not None:
+        result["start_date"] = start.isoformat()
+    if end is not None:
+        result["end_date"] = end.isoformat()
+    return result
@@ -0,0 +1,43 @@
+from datetime import date
+import logging
+import os
+import re
+
+from cache import LRUCache
+from storage import get_store
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+# Hit rate is logged once per this many lookups.
+ANSWER_CACHE_LOG_EVERY = 100
+
+# Answers to analytics questions keyed by (user_id, normalised question, day, data version).
+answer_cache = LRUCache(maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL_SECONDS)
+
+
+def normalise_query(text: str) -> str:
+    """Lowercase the question and drop punctuation and extra spaces, so trivial rewordings share an entry."""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+async def answer_key(user_id: int, text: str) -> tuple:
+    """Build the cache key for a question.
+
+    The key includes the user's data version, so entries are never served
+    after the user's transactions change, and today's date, since questions
+    like "this month" mean something else tomorrow.
+    """
+    version = await get_store().get_data_version(user_id)
+    return (user_id, normalise_query(text), date.today(), version)
+
+
+def get_answer(key: tuple):
+    answer = answer_cache.get(key)
+    lookups = answer_cache.hits + answer_cache.misses
+    if lookups % ANSWER_CACHE_LOG_EVERY == 0:
+        logging.info("Answer cache: %s", answer_cache.stats())
+    return answer
+
+
+def set_answer(key: tuple, answer: str) -> None:
+    answer_cache.set(key, answer)
@@ -0,0 +1,258 @@
+"""Measure handler latency and throughput offline.
+
+Drives handle_message, get_balance and get_statement with synthetic Telegram
+updates against a store seeded with one user's history, and replaces Gemini
+with a stub that answers after a fixed delay. Nothing leaves the machine, so
+results are comparable between runs and commits.
+
+Backends:
+    mongo      (default) the production store, in the MONGO_DB database (default
+               FinancesDB_benchmark) of a local mongod at MONGO_URI (default
+               mongodb://localhost:27017). Only the benchmark user's
+               documents are replaced.
+    sqlite     a throwaway SQLite file
+
+Scenarios:
+    add        handle_message with a transaction the fast parser handles
+    query      handle_message with a question that goes through Gemini twice
+               (answer cache cleared before each call unless --warm-cache is given)
+    balance    get_balance
+    statement  get_statement for the current month (statement cache cleared
+               before each call unless --warm-cache is given)
+
+Usage:
+    python benchmark.py [--backend sqlite] [--sizes 10,1000,100000,1000000] [--requests 200]
+                        [--concurrency 8] [--llm-latency 0.3] [--json results.json]
+"""
+from datetime import date, timedelta
+from types import SimpleNamespace
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+BENCHMARK_USER_ID = 1000
+
+# Handlers read these at import time, so they are set before importing them.
+os.environ["AUTHORIZED_USER_ID"] = str(BENCHMARK_USER_ID)
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB", "FinancesDB_benchmark")
+# A standalone mongod has no replica set, so it can't run multi-document transactions.
+os.environ.setdefault("MONGO_TRANSACTIONS", "0")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+# The stub has no quota, so Gemini's rate limits would only measure the limiter.
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+
+logging.basicConfig(level=logging.WARNING)
+
+from answer_cache import answer_cache
+import llm_client
+import storage
+import telegram_bot_mongo
+from models import ACCOUNTS
+from sqlite_store import SCHEMA, SQLiteStore
+from statement_renderer import statement_cache
+from storage import to_datetime
+
+BACKENDS = ["mongo", "sqlite"]
+SCENARIOS = ["add", "query", "balance", "statement"]
+SEED_DAYS = 365
+SEED_CHUNK = 10000
+
+
+class StubModel:
+    """Stands in for the Gemini model: waits, then answers like it would."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def generate_content_async(self, prompt: str, generation_config=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if generation_config is not None:
+            # Structured extraction: a month-to-date summary question.
+            today = date.today()
+            text = json.dumps({
+                "intent": "general_inquiry",
+                "query_type": "range_summary",
+                "start_date": today.replace(day=1).isoformat(),
+                "end_date": today.isoformat(),
+            })
+        else:
+            text = "You have spent less than you earned so far this month."
+        return SimpleNamespace(text=text)
+
+
+class FakeMessage:
+    def __init__(self, text: str):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text: str, **kwargs):
+        self.replies.append(text)
+
+    async def reply_document(self, document, filename: str = None, caption: str = None, **kwargs):
+        self.replies.append(filename)
+
+
+def make_update(text: str = ""):
+    user = SimpleNamespace(id=BENCHMARK_USER_ID, first_name="Bench", language_code="en")
+    update = SimpleNamespace(effective_user=user, effective_chat=SimpleNamespace(id=BENCHMARK_USER_ID), message=FakeMessage(text))
+    return update, SimpleNamespace(args=[])
+
+
+def seed_rows(count: int):
+    """Yield count random transactions for the benchmark user, spread over the last SEED_DAYS days.
+
+    Each row is (day, account, income, expenditure, remarks). The same count
+    always yields the same rows, whichever backend they are written to.
+    """
+    rng = random.Random(count)
+    today = date.today()
+    for _ in range(count):
+        day = today - timedelta(days=rng.randrange(SEED_DAYS))
+        amount = round(rng.uniform(10, 5000), 2)
+        if rng.random() < 0.1:
+            yield day, rng.choice(["Salary", "Freelance"]), amount, 0, "seeded income"
+        else:
+            yield day, rng.choice(ACCOUNTS), 0, amount, "seeded expense"
+
+
+def _chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed_sqlite(path: str, count: int) -> SQLiteStore:
+    """Write count seeded transactions to a new SQLite file and return its store."""
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    with connection:
+        for chunk in _chunks(seed_rows(count), SEED_CHUNK):
+            connection.executemany(
+                "INSERT INTO finances (user_id, date, account, income, expenditure, remarks) VALUES (?, ?, ?, ?, ?, ?)",
+                [(BENCHMARK_USER_ID, day.strftime('%Y-%m-%d'), *rest) for day, *rest in chunk],
+            )
+    connection.close()
+    return SQLiteStore(path)
+
+
+async def seed_mongo(count: int):
+    """Replace the benchmark user's documents with count seeded transactions and return the store."""
+    # Imported only for this backend, so SQLite runs don't need a mongod or pymongo.
+    import finances_store
+
+    await finances_store.finances_collection.delete_many({"user_id": BENCHMARK_USER_ID})
+    await finances_store.balances_collection.delete_many({"user_id": BENCHMARK_USER_ID})
+    await finances_store.ensure_indexes()
+    for chunk in _chunks(seed_rows(count), SEED_CHUNK):
+        await finances_store.insert_transactions([
+            {"user_id": BENCHMARK_USER_ID, "date": to_datetime(day), "account": account,
+             "income": income, "expenditure": expenditure, "remarks": remarks}
+            for day, account, income, expenditure, remarks in chunk
+        ])
+    return finances_store.MongoStore()
+
+
+async def call(scenario: str, warm_cache: bool) -> None:
+    if scenario == "add":
+        update, context = make_update(f"Spent {random.randint(10, 999)} on groceries")
+        await telegram_bot_mongo.handle_message(update, context)
+    elif scenario == "query":
+        if not warm_cache:
+            answer_cache.clear()
+        update, context = make_update("How am I doing this month compared to last month?")
+        await telegram_bot_mongo.handle_message(update, context)
+    elif scenario == "balance":
+        update, context = make_update()
+        await telegram_bot_mongo.get_balance(update, context)
+    elif scenario == "statement":
+        if not warm_cache:
+            statement_cache.clear()
+        update, context = make_update()
+        await telegram_bot_mongo.get_statement(update, context)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(scenario: str, requests: int, concurrency: int, warm_cache: bool) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed():
+        async with semaphore:
+            started = time.perf_counter()
+            await call(scenario, warm_cache)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "messages_per_second": requests / elapsed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS, default="mongo", help="Store to seed and query.")
+    parser.add_argument("--sizes", default="10,1000,100000,1000000", help="Comma-separated history sizes to test.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Calls per scenario and size.")
+    parser.add_argument("--statement-requests", type=int, default=10, help="Calls for the statement scenario, which is much slower.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls in flight at once.")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds the stub Gemini takes per call.")
+    parser.add_argument("--warm-cache", action="store_true", help="Keep answers and rendered statements cached between calls.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    stub = StubModel(args.llm_latency)
+    llm_client.set_model(stub)
+    results = []
+    print(f"Backend: {args.backend}")
+    print(f"{'scenario':<10} {'history':>9} {'calls':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'msg/s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(value) for value in args.sizes.split(",")):
+            if args.backend == "mongo":
+                store = await seed_mongo(size)
+            else:
+                store = seed_sqlite(os.path.join(directory, f"benchmark_{size}.db"), size)
+            storage.set_store(store)
+            await store.rebuild_balance(BENCHMARK_USER_ID)
+            for scenario in args.scenarios.split(","):
+                requests = args.statement_requests if scenario == "statement" else args.requests
+                result = await run_scenario(scenario, requests, args.concurrency, args.warm_cache)
+                result.update(scenario=scenario, history=size, requests=requests)
+                results.append(result)
+                print(f"{scenario:<10} {size:>9} {requests:>6} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                      f"{result['p99_ms']:>9.1f} {result['messages_per_second']:>8.1f}")
+
+    print(f"Stub Gemini calls: {stub.calls}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": args.backend, "llm_latency": args.llm_latency, "concurrency": args.concurrency, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Measure how long the bot takes to import and build its Application.
+
+Each run starts a fresh interpreter, so nothing is shared between runs. The
+slowest imports of the last run are listed, from python -X importtime.
+
+Usage:
+    python benchmark_startup.py [--runs 10] [--module telegram_bot_mongo] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# build_application() only needs a well-formed token; nothing is sent to Telegram.
+STARTUP_ENV = {
+    "TELEGRAM_TOKEN": "123456:benchmark",
+    "GEMINI_API_KEY": "benchmark",
+}
+
+
+def run_once(module: str, importtime: bool = False) -> tuple:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", f"import {module}; {module}.build_application()"]
+    started = time.perf_counter()
+    result = subprocess.run(
+        command,
+        env={**os.environ, **STARTUP_ENV},
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - started, result.stderr
+
+
+def slowest_imports(importtime_output: str, top: int) -> list:
+    # Lines look like "import time:       self [us] |  cumulative | imported package".
+    imports = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.rstrip()))
+    # Only top-level imports, so each module's time is not also counted in its parents.
+    top_level = [(cumulative, name.strip()) for cumulative, name in imports if not name.startswith("  ")]
+    return sorted(top_level, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", default="telegram_bot_mongo", help="The bot module to import.")
+    parser.add_argument("--top", type=int, default=15, help="How many of the slowest imports to list.")
+    args = parser.parse_args()
+
+    timings = [run_once(args.module)[0] for _ in range(args.runs)]
+    print(f"{args.module}: import + build_application over {args.runs} runs")
+    print(f"  min {min(timings) * 1000:.0f} ms, median {statistics.median(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms")
+
+    _, importtime_output = run_once(args.module, importtime=True)
+    print("Slowest top-level imports (cumulative):")
+    for cumulative, name in slowest_imports(importtime_output, args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
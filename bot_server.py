@@ -0,0 +1,202 @@
+from telegram import Update
+from telegram.ext import Application
+import tornado.web
+from tornado.httpserver import HTTPServer
+import asyncio
+import json
+import logging
+import os
+import secrets
+import signal
+
+import metrics
+
+# polling, webhook, or worker (updates forwarded by dispatcher.py, which owns the webhook).
+BOT_MODES = ("polling", "webhook", "worker")
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Telegram sends the secret back with every update. Without one anybody who
+# knows the URL could post updates as any user, so one is generated if unset.
+WEBHOOK_SECRET_CONFIGURED = bool(os.getenv("WEBHOOK_SECRET"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+BOT_LISTEN = os.getenv("BOT_LISTEN", "0.0.0.0")
+# In polling mode the HTTP server (health and metrics endpoints only) is started only if BOT_PORT is set.
+BOT_PORT = os.getenv("BOT_PORT")
+RESTART_BACKOFF_SECONDS = float(os.getenv("RESTART_BACKOFF_SECONDS", "1"))
+RESTART_BACKOFF_MAX_SECONDS = float(os.getenv("RESTART_BACKOFF_MAX_SECONDS", "60"))
+
+
+class ServerState:
+    def __init__(self, readiness_checks: list):
+        self.ready = False
+        self.readiness_checks = readiness_checks
+        self.stopping = asyncio.Event()
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    """Liveness: the process is up and serving HTTP."""
+
+    def get(self):
+        self.write({"status": "ok"})
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """Prometheus metrics: stage and update latencies, update counts and LLM token usage."""
+
+    def get(self):
+        body, content_type = metrics.render()
+        self.set_header("Content-Type", content_type)
+        self.write(body)
+
+
+class ReadinessHandler(tornado.web.RequestHandler):
+    """Readiness: the bot is running and its dependencies answer."""
+
+    def initialize(self, state: ServerState):
+        self.state = state
+
+    async def get(self):
+        checks = {}
+        if self.state.ready:
+            for check in self.state.readiness_checks:
+                try:
+                    checks[check.__name__] = bool(await check())
+                except Exception as e:
+                    logging.error(f"Readiness check {check.__name__} failed: {e}")
+                    checks[check.__name__] = False
+        ready = self.state.ready and all(checks.values())
+        self.set_status(200 if ready else 503)
+        self.write({"status": "ready" if ready else "not ready", "checks": checks})
+
+
+class TelegramWebhookHandler(tornado.web.RequestHandler):
+    """Receives updates from Telegram and queues them for the Application."""
+
+    def initialize(self, bot_application: Application, secret_token: str):
+        self.bot_application = bot_application
+        self.secret_token = secret_token
+
+    async def post(self):
+        received = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secrets.compare_digest(received, self.secret_token):
+            raise tornado.web.HTTPError(403)
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+        await self.bot_application.update_queue.put(Update.de_json(data, self.bot_application.bot))
+
+
+def _make_http_app(application: Application, state: ServerState, webhook: bool) -> tornado.web.Application:
+    routes = [
+        (r"/healthz", HealthHandler),
+        (r"/readyz", ReadinessHandler, {"state": state}),
+        (r"/metrics", MetricsHandler),
+    ]
+    if webhook:
+        routes.append((WEBHOOK_PATH, TelegramWebhookHandler, {"bot_application": application, "secret_token": WEBHOOK_SECRET}))
+    return tornado.web.Application(routes)
+
+
+def validate_config() -> None:
+    """Raise ValueError if the server settings can't work, so run_forever fails fast."""
+    if BOT_MODE not in BOT_MODES:
+        raise ValueError(f"BOT_MODE must be one of {', '.join(BOT_MODES)}, not {BOT_MODE!r}.")
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise ValueError("Please set the WEBHOOK_URL environment variable.")
+    if BOT_MODE == "worker" and not WEBHOOK_SECRET_CONFIGURED:
+        # The dispatcher signs forwarded updates with it, so a worker cannot make its own up.
+        raise ValueError("Please set the WEBHOOK_SECRET environment variable to the dispatcher's secret.")
+
+
+async def serve(application: Application, state: ServerState) -> None:
+    """Run the application until a shutdown signal arrives.
+
+    In webhook and worker mode updates arrive over HTTP; otherwise the
+    Updater polls. Only webhook mode registers the webhook with Telegram; a
+    worker receives the updates the dispatcher routes to it.
+    On shutdown readiness turns off first, then the HTTP server stops taking
+    requests and the updates already queued are processed before exiting.
+    """
+    webhook = BOT_MODE in ("webhook", "worker")
+
+    server = None
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        if BOT_MODE == "webhook":
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        elif BOT_MODE == "polling":
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+
+        if webhook or BOT_PORT:
+            server = HTTPServer(_make_http_app(application, state, webhook))
+            server.listen(int(BOT_PORT or "8080"), address=BOT_LISTEN)
+
+        state.ready = True
+        if BOT_MODE == "worker":
+            print(f"Bot is running as worker {os.getenv('SHARD_INDEX', '?')} of {os.getenv('SHARD_COUNT', '?')}.")
+        else:
+            print(f"Bot is running in {BOT_MODE} mode.")
+        await state.stopping.wait()
+    finally:
+        state.ready = False
+        if server is not None:
+            server.stop()
+            await server.close_all_connections()
+        if application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+async def run_forever(build_application, readiness_checks: list = ()) -> None:
+    """Serve the bot, restarting it after a crash without leaving the event loop.
+
+    Module-level clients (MongoDB, Gemini) live as long as the event loop, so
+    they stay connected across restarts. Restarts back off exponentially.
+    Configuration errors, from validate_config or the first build_application
+    call, are raised instead of retried.
+
+    Args:
+        build_application: Returns a new, fully configured Application.
+        readiness_checks: Async callables that return True when a dependency is healthy.
+    """
+    state = ServerState(list(readiness_checks))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, state.stopping.set)
+        except NotImplementedError:
+            pass
+
+    validate_config()
+    application = build_application()
+    backoff = RESTART_BACKOFF_SECONDS
+    while not state.stopping.is_set():
+        try:
+            await serve(application, state)
+            backoff = RESTART_BACKOFF_SECONDS
+        except Exception as e:
+            logging.exception(f"Bot crashed, restarting in {backoff} seconds: {e}")
+            try:
+                await asyncio.wait_for(state.stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX_SECONDS)
+            # A shut down Application can't be started again.
+            application = build_application()
+
+
+def run(build_application, readiness_checks: list = ()) -> None:
+    asyncio.run(run_forever(build_application, readiness_checks))
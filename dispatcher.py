@@ -0,0 +1,234 @@
+"""Route Telegram updates to worker processes, each owning a share of the users.
+
+The dispatcher receives the webhook and forwards every update to the worker
+that owns its user: crc32(user_id) % number of workers. A user's updates
+always reach the same worker, so their per-user ordering, answer and
+statement caches and allowlist lookups all stay local to that worker, and
+adding workers adds throughput.
+
+Workers are the normal bot (telegram_bot_mongo.py) run with BOT_MODE=worker.
+With SHARD_WORKER_URLS unset the dispatcher starts SHARD_WORKERS of them on
+this machine, on ports SHARD_BASE_PORT and up, and restarts any that exit.
+For several machines, run the workers there and list their base URLs in
+SHARD_WORKER_URLS, in the same order on every dispatcher.
+
+All workers must share one storage backend that supports several users
+(mongo, or sqlite with all workers on one machine).
+
+Usage:
+    WEBHOOK_URL=https://bot.example.com SHARD_WORKERS=4 python dispatcher.py
+"""
+from telegram import Bot, Update
+import tornado.web
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.httpserver import HTTPServer
+import asyncio
+import json
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import zlib
+
+import dotenv
+
+# Before importing bot_server, which reads its settings at import time.
+dotenv.load_dotenv()
+
+from bot_server import BOT_LISTEN, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_SECRET_CONFIGURED, WEBHOOK_URL, HealthHandler
+
+logging.basicConfig(level=logging.INFO)
+
+DISPATCHER_PORT = int(os.getenv("BOT_PORT", "8080"))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 1)))
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", "8081"))
+SHARD_WORKER_URLS = [url.strip().rstrip("/") for url in os.getenv("SHARD_WORKER_URLS", "").split(",") if url.strip()]
+SHARD_WORKER_SCRIPT = os.getenv("SHARD_WORKER_SCRIPT", "telegram_bot_mongo.py")
+SHARD_FORWARD_TIMEOUT_SECONDS = float(os.getenv("SHARD_FORWARD_TIMEOUT_SECONDS", "10"))
+SHARD_MAX_CLIENTS = int(os.getenv("SHARD_MAX_CLIENTS", "256"))
+SHARD_RESTART_SECONDS = float(os.getenv("SHARD_RESTART_SECONDS", "1"))
+
+
+def update_user_id(data: dict):
+    """Return the id of the user an update came from, or its chat's id, or None."""
+    for key, value in data.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        for field in ("from", "user", "chat"):
+            sender = value.get(field)
+            if isinstance(sender, dict) and "id" in sender:
+                return sender["id"]
+    return None
+
+
+def shard_for(user_id, count: int) -> int:
+    """Return the index of the worker that owns user_id.
+
+    crc32 rather than hash(), which is salted per process, so every
+    dispatcher and restart agrees on the owner.
+    """
+    if user_id is None:
+        return 0
+    return zlib.crc32(str(user_id).encode()) % count
+
+
+class WorkerPool:
+    """The worker processes started on this machine."""
+
+    def __init__(self, count: int, base_port: int):
+        self.ports = [base_port + index for index in range(count)]
+        self.processes = [None] * count
+
+    @property
+    def urls(self) -> list:
+        return [f"http://127.0.0.1:{port}" for port in self.ports]
+
+    def _start(self, index: int) -> subprocess.Popen:
+        env = dict(
+            os.environ,
+            BOT_MODE="worker",
+            BOT_PORT=str(self.ports[index]),
+            BOT_LISTEN="127.0.0.1",
+            # The secret may have been generated by this process; workers check forwarded updates against it.
+            WEBHOOK_SECRET=WEBHOOK_SECRET,
+            SHARD_INDEX=str(index),
+            SHARD_COUNT=str(len(self.ports)),
+        )
+        logging.info("Starting worker %d on port %d", index, self.ports[index])
+        return subprocess.Popen([sys.executable, SHARD_WORKER_SCRIPT], env=env)
+
+    async def supervise(self, stopping: asyncio.Event) -> None:
+        """Start every worker and restart any that exit until stopping is set."""
+        while not stopping.is_set():
+            for index, process in enumerate(self.processes):
+                if process is None or process.poll() is not None:
+                    if process is not None:
+                        logging.error("Worker %d exited with code %s, restarting", index, process.returncode)
+                    self.processes[index] = self._start(index)
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=SHARD_RESTART_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self) -> None:
+        # SIGTERM lets each worker finish the updates it has queued.
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                process.wait()
+
+
+class DispatchHandler(tornado.web.RequestHandler):
+    """Receives updates from Telegram and forwards each to the worker owning its user.
+
+    A worker that is down or slow gets a 503 back to Telegram, which then
+    retries the update later instead of it being lost.
+    """
+
+    def initialize(self, worker_urls: list, client: AsyncHTTPClient):
+        self.worker_urls = worker_urls
+        self.client = client
+
+    async def post(self):
+        received = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secrets.compare_digest(received, WEBHOOK_SECRET):
+            raise tornado.web.HTTPError(403)
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+
+        shard = shard_for(update_user_id(data), len(self.worker_urls))
+        headers = {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+        try:
+            response = await self.client.fetch(HTTPRequest(
+                self.worker_urls[shard] + WEBHOOK_PATH, method="POST", body=self.request.body,
+                headers=headers, request_timeout=SHARD_FORWARD_TIMEOUT_SECONDS,
+            ), raise_error=False)
+        except Exception as e:
+            logging.error(f"Forwarding update {data.get('update_id')} to worker {shard} failed: {e}")
+            raise tornado.web.HTTPError(503)
+        if response.code != 200:
+            logging.error(f"Worker {shard} answered update {data.get('update_id')} with {response.code}")
+            raise tornado.web.HTTPError(503)
+
+
+class DispatcherReadinessHandler(tornado.web.RequestHandler):
+    """Readiness: every worker reports ready."""
+
+    def initialize(self, worker_urls: list, client: AsyncHTTPClient):
+        self.worker_urls = worker_urls
+        self.client = client
+
+    async def get(self):
+        async def check(url):
+            try:
+                response = await self.client.fetch(url + "/readyz", request_timeout=5, raise_error=False)
+                return response.code == 200
+            except Exception:
+                return False
+
+        results = await asyncio.gather(*(check(url) for url in self.worker_urls))
+        ready = all(results)
+        self.set_status(200 if ready else 503)
+        self.write({"status": "ready" if ready else "not ready", "workers": dict(zip(self.worker_urls, results))})
+
+
+async def run_dispatcher() -> None:
+    TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+    if not TELEGRAM_TOKEN:
+        raise ValueError("Please set the TELEGRAM_TOKEN environment variable.")
+    if not WEBHOOK_URL:
+        raise ValueError("Please set the WEBHOOK_URL environment variable.")
+    if SHARD_WORKER_URLS and not WEBHOOK_SECRET_CONFIGURED:
+        raise ValueError("Please set WEBHOOK_SECRET, shared with the workers in SHARD_WORKER_URLS.")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            pass
+
+    pool = None
+    supervisor = None
+    worker_urls = SHARD_WORKER_URLS
+    if not worker_urls:
+        pool = WorkerPool(SHARD_WORKERS, SHARD_BASE_PORT)
+        worker_urls = pool.urls
+        supervisor = asyncio.create_task(pool.supervise(stopping))
+
+    client = AsyncHTTPClient(max_clients=SHARD_MAX_CLIENTS)
+    handler_args = {"worker_urls": worker_urls, "client": client}
+    server = HTTPServer(tornado.web.Application([
+        (r"/healthz", HealthHandler),
+        (r"/readyz", DispatcherReadinessHandler, handler_args),
+        (WEBHOOK_PATH, DispatchHandler, handler_args),
+    ]))
+    server.listen(DISPATCHER_PORT, address=BOT_LISTEN)
+    try:
+        async with Bot(TELEGRAM_TOKEN) as bot:
+            await bot.set_webhook(
+                url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        print(f"Dispatching updates to {len(worker_urls)} workers.")
+        await stopping.wait()
+    finally:
+        stopping.set()
+        server.stop()
+        await server.close_all_connections()
+        if supervisor is not None:
+            await supervisor
+        if pool is not None:
+            await asyncio.to_thread(pool.stop)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_dispatcher())
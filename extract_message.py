@@ -0,0 +1,155 @@
+from llm_client import generate_text
+import datetime
+import logging
+import json
+import re
+from typing import Optional
+
+from fast_parser import MONTHS, parse_transactions
+from intent_classifier import classify, log_label
+from models import ACCOUNTS, INTENTS, QUERY_TYPES, AnalyticsQuery, MessageExtraction, TransactionData
+
+# Gemini fills this schema directly, so the reply is always a bare JSON object.
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "intent": {"type": "STRING", "enum": INTENTS},
+        "transactions": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "amount": {"type": "NUMBER", "nullable": True},
+                    "account": {"type": "STRING", "enum": ACCOUNTS, "nullable": True},
+                    "transaction_type": {"type": "STRING", "enum": ["Income", "Expense"], "nullable": True},
+                    "date": {"type": "STRING", "description": "YYYY-MM-DD", "nullable": True},
+                },
+            },
+        },
+        "account": {"type": "STRING", "enum": ACCOUNTS, "nullable": True},
+        "query_type": {"type": "STRING", "enum": QUERY_TYPES, "nullable": True},
+        "start_date": {"type": "STRING", "description": "YYYY-MM-DD", "nullable": True},
+        "end_date": {"type": "STRING", "description": "YYYY-MM-DD", "nullable": True},
+    },
+    "required": ["intent"],
+}
+
+# A plain dict, so building it does not need google.generativeai imported.
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": RESPONSE_SCHEMA,
+}
+
+# Sent once per process as the model's system instruction; only the date and message change per call.
+SYSTEM_INSTRUCTION = """\
+You are a friendly AI assistant for a finance tracking application. Classify the user's message and, if it records a transaction, extract its details.
+
+Instructions:
+1. The intent must be one of: "add_transaction", "get_balance", "get_statement", "general_inquiry".
+2. Return "get_statement" only if the user asks for a statement.
+3. If the intent cannot be determined, return "general_inquiry".
+4. For "add_transaction", return one entry in "transactions" for each transaction the message records, with:
+   - amount: the numerical value
+   - account: one of Home, Clothes, Trips, Labor, EMIs, Salary, Freelance, Other
+   - transaction_type: Income or Expense
+   - date: YYYY-MM-DD if a date is mentioned, otherwise null
+5. For "general_inquiry", describe the question as a query that can be answered from the user's transactions:
+   - query_type: one of
+     "balance" (balance, optionally between start_date and end_date),
+     "spend_on_date" (spending on one day, given as start_date),
+     "spend_by_account" (spending in one account, optionally between start_date and end_date),
+     "top_account" (where the user spent the most, optionally between start_date and end_date),
+     "range_summary" (income and spending between start_date and end_date),
+     "none" (greetings and questions unrelated to the user's transactions)
+   - account: the account the question is about, otherwise null
+   - start_date and end_date: YYYY-MM-DD, both inclusive, otherwise null. "This month" runs from the first to the last day of the month.
+6. For "get_statement", set start_date and end_date to the period asked for, otherwise null.
+7. Set every field that does not apply to the intent to null.
+8. The message can be in any language.
+
+Example:
+User Message: "Spent 500 on groceries"
+Output: {"intent": "add_transaction", "transactions": [{"amount": 500, "account": "Home", "transaction_type": "Expense", "date": null}]}
+
+User Message: "Received 1000 from freelance work on 2025/01/01"
+Output: {"intent": "add_transaction", "transactions": [{"amount": 1000, "account": "Freelance", "transaction_type": "Income", "date": "2025-01-01"}]}
+
+User Message: "200 on food, 300 petrol and got 5000 from a freelance gig"
+Output: {"intent": "add_transaction", "transactions": [{"amount": 200, "account": "Home", "transaction_type": "Expense", "date": null}, {"amount": 300, "account": "Trips", "transaction_type": "Expense", "date": null}, {"amount": 5000, "account": "Freelance", "transaction_type": "Income", "date": null}]}
+
+User Message: "What is my current balance?"
+Output: {"intent": "get_balance", "transactions": [], "account": null}
+
+User Message: "How much did I spend on 25 January 2025?"
+Output: {"intent": "general_inquiry", "transactions": [], "account": null, "query_type": "spend_on_date", "start_date": "2025-01-25", "end_date": null}
+
+User Message: "Where did I spend the most in February 2025?"
+Output: {"intent": "general_inquiry", "transactions": [], "account": null, "query_type": "top_account", "start_date": "2025-02-01", "end_date": "2025-02-28"}
+"""
+
+# Requests naming a period still need Gemini to turn it into dates.
+PERIOD_PATTERN = re.compile(r"\d|\b(?:last|previous|yesterday|week|year|" + "|".join(MONTHS) + r")\b", re.I)
+
+
+def extract_locally(text: str) -> Optional[MessageExtraction]:
+    """Handle the messages that need no Gemini call.
+
+    Common transaction phrasings are parsed by the fast parser, and balance
+    and statement requests naming no period are classified by the local
+    classifier when it is confident.
+
+    Args:
+        text: The user's message in natural language.
+
+    Returns:
+        The MessageExtraction, or None if the message needs Gemini.
+    """
+    transactions = parse_transactions(text)
+    if transactions is not None:
+        log_label(text, "add_transaction", "fast_parser")
+        return MessageExtraction(intent="add_transaction", transactions=transactions)
+
+    intent = classify(text)
+    if intent in ("get_balance", "get_statement") and not PERIOD_PATTERN.search(text):
+        return MessageExtraction(intent=intent)
+    return None
+
+
+async def extract_with_gemini(text: str) -> MessageExtraction:
+    """Classify the user's message and extract its details in one Gemini call.
+
+    Args:
+        text: The user's message in natural language.
+
+    Returns:
+        A validated MessageExtraction. The transactions are only set for the
+        "add_transaction" intent, one per entry in the message, and the query
+        only for "general_inquiry" and "get_statement".
+    """
+    prompt = f"""
+    Today's date is {datetime.date.today().isoformat()}.
+
+    User Message: {text}
+    """
+
+    output = await generate_text(prompt, system_instruction=SYSTEM_INSTRUCTION, name="extract",
+                                 generation_config=GENERATION_CONFIG)
+    logging.info("Gemini Output: %s", output)
+    fields = json.loads(output)
+    intent = fields.pop("intent", None)
+    if intent not in INTENTS:
+        intent = "general_inquiry"
+    log_label(text, intent, "llm")
+
+    # Nulls fall back to the model defaults; bad values raise a ValidationError (a ValueError).
+    fields = {key: value for key, value in fields.items() if value is not None}
+    transactions = []
+    query = None
+    if intent == "add_transaction":
+        transactions = [
+            TransactionData.model_validate({key: value for key, value in item.items() if value is not None})
+            for item in fields.get("transactions", [])
+        ]
+    elif intent in ("general_inquiry", "get_statement"):
+        query = AnalyticsQuery.model_validate({key: fields[key] for key in AnalyticsQuery.model_fields if key in fields})
+    return MessageExtraction(intent=intent, transactions=transactions, query=query)
@@ -0,0 +1,179 @@
+import datetime
+import logging
+import re
+from typing import Optional
+
+from models import TransactionData
+
+# Keywords that map a message onto one of the fixed accounts.
+ACCOUNT_KEYWORDS = {
+    "Home": ["home", "groceries", "grocery", "rent", "food", "vegetables", "milk", "electricity", "water", "gas", "household"],
+    "Clothes": ["clothes", "clothing", "shirt", "shirts", "shoes", "jeans", "dress", "jacket"],
+    "Trips": ["trip", "trips", "travel", "flight", "hotel", "train", "bus", "taxi", "cab", "vacation"],
+    "Labor": ["labor", "labour", "worker", "workers", "maid", "plumber", "electrician", "carpenter", "mason"],
+    "EMIs": ["emi", "emis", "loan", "installment", "instalment", "mortgage"],
+    "Salary": ["salary", "paycheck", "payslip", "wages"],
+    "Freelance": ["freelance", "freelancing", "client", "gig", "project"],
+    "Other": ["other", "misc", "miscellaneous"],
+}
+
+EXPENSE_VERBS = ["spent", "spend", "paid", "pay", "bought", "buy", "purchased", "gave", "lent", "transferred"]
+INCOME_VERBS = ["received", "receive", "got", "earned", "earn", "credited", "income"]
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11,
+    "dec": 12, "december": 12,
+}
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+DATE_PATTERNS = [
+    # 2025-01-20, 2025/01/20
+    (re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b"), lambda m: (m[1], m[2], m[3])),
+    # 20/01/2025, 20-01-2025
+    (re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})\b"), lambda m: (m[3], m[2], m[1])),
+    # 20th January 2025, 20 Jan 2025
+    (re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?(?:\s+of)?\s+({_MONTH})\.?,?\s+(\d{{4}})\b", re.I), lambda m: (m[3], MONTHS[m[2].lower()], m[1])),
+    # January 20, 2025
+    (re.compile(rf"\b({_MONTH})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b", re.I), lambda m: (m[3], MONTHS[m[1].lower()], m[2])),
+]
+RELATIVE_DATES = {"today": 0, "yesterday": 1}
+
+# Separates the entries of messages like "spent 200 on food, paid 300 for a cab and got 5000 salary".
+SEPARATOR_PATTERN = re.compile(r"\s*(?:[;\n]|,(?!\d{3}\b)|\band\b)\s*", re.I)
+
+# Words that make a message a question about past transactions rather than a new one.
+QUESTION_WORDS = ["how", "what", "much", "did", "do", "does", "show", "when", "where", "which", "why"]
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+# Dates the patterns above can't read. A message still mentioning one after its
+# date is removed is left to Gemini rather than stored with today's date.
+UNREAD_DATE_PATTERN = re.compile(
+    rf"\b(?:{_MONTH}|{'|'.join(WEEKDAYS)}|\d+(?:st|nd|rd|th)|last|past|next|ago|before|after|tomorrow|weeks?|weekend)\b"
+    r"|\b(?:in|of|since|during|year)\s+(?:19|20)\d{2}\b",
+    re.I,
+)
+
+AMOUNT_PATTERN = re.compile(r"(?<![\w.])(?:rs\.?|inr|₹|\$)?\s*(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*(k)?(?![\w.])", re.I)
+
+
+class ParserStats:
+    """Counts how many messages the fast path answered without Gemini."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def total(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.total if self.total else 0.0
+
+    def record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.total % 100 == 0:
+            logging.info("Fast parser hit rate: %.1f%% (%d/%d)", self.hit_rate * 100, self.hits, self.total)
+
+
+stats = ParserStats()
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+
+def _extract_date(text: str):
+    """Return the date mentioned in the text and the text with it removed."""
+    for pattern, parts in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            year, month, day = (int(part) for part in parts(match))
+            try:
+                found = datetime.date(year, month, day)
+            except ValueError:
+                return None, None
+            return found, text[:match.start()] + " " + text[match.end():]
+    for word, days_ago in RELATIVE_DATES.items():
+        match = re.search(rf"\b{word}\b", text, re.I)
+        if match:
+            found = datetime.date.today() - datetime.timedelta(days=days_ago)
+            return found, text[:match.start()] + " " + text[match.end():]
+    return None, text
+
+
+def _match_one(words: set, options: dict) -> Optional[str]:
+    matches = [name for name, keywords in options.items() if words.intersection(keywords)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def guess_account(text: str) -> Optional[str]:
+    """Return the one account whose keywords appear in text, or None if none or several do."""
+    return _match_one(_words(text), ACCOUNT_KEYWORDS)
+
+
+def parse_transactions(text: str) -> Optional[list]:
+    """Parse common transaction phrasings such as "Spent 500 on groceries" locally.
+
+    Only unambiguous transactions are parsed: exactly one amount, an income
+    or expense verb, and exactly one account. Questions, such as "Did I pay
+    500 for rent?", are never parsed, nor are messages with a date the parser
+    can't read, such as "on 5th March", "last week" or "in 2025". Anything
+    else returns None so the caller can fall back to Gemini.
+
+    The whole message is tried as one transaction first. Otherwise it is
+    split on commas, semicolons, new lines and "and", and parsed only if
+    every part is a confident match on its own.
+
+    Args:
+        text: The user's message.
+
+    Returns:
+        The parsed transactions, or None if the message is not a confident match.
+    """
+    result = _parse(text)
+    if result is not None:
+        result = [result]
+    else:
+        parts = [part for part in SEPARATOR_PATTERN.split(text) if part.strip()]
+        if len(parts) > 1:
+            parsed = [_parse(part) for part in parts]
+            if all(parsed):
+                result = parsed
+    stats.record(result is not None)
+    return result
+
+
+def _parse(text: str) -> Optional[TransactionData]:
+    if text.rstrip().endswith("?") or _words(text).intersection(QUESTION_WORDS):
+        return None
+    date, rest = _extract_date(text)
+    if rest is None or UNREAD_DATE_PATTERN.search(rest):
+        return None
+
+    amounts = AMOUNT_PATTERN.findall(rest)
+    if len(amounts) != 1:
+        return None
+    whole, fraction, thousands = amounts[0]
+    amount = float(whole.replace(",", "") + fraction)
+    if thousands:
+        amount *= 1000
+    if amount <= 0:
+        return None
+
+    words = _words(rest)
+    if words.intersection(["not", "no", "didn", "didnt", "never", "if", "will", "should"]):
+        return None
+    transaction_type = _match_one(words, {"Expense": EXPENSE_VERBS, "Income": INCOME_VERBS})
+    account = _match_one(words, ACCOUNT_KEYWORDS)
+    if account in ("Salary", "Freelance") and transaction_type is None:
+        transaction_type = "Income"
+    if transaction_type is None or account is None:
+        return None
+
+    return TransactionData(amount=amount, account=account, transaction_type=transaction_type, date=date)
@@ -0,0 +1,292 @@
+from datetime import datetime
+import dotenv
+import logging
+import os
+from pymongo import ASCENDING, AsyncMongoClient, ReturnDocument
+from pymongo.server_api import ServerApi
+
+from storage import EMPTY_TOTALS, TransactionStore, balance_of
+
+dotenv.load_dotenv()
+
+# MongoDB setup
+uri = os.getenv("MONGO_URI")
+client = AsyncMongoClient(
+    uri,
+    server_api=ServerApi('1'),
+    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "2")),
+    maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+)
+
+db = client[os.getenv("MONGO_DB", "FinancesDB")]
+finances_collection = db['finances']
+# One summary document per user, keyed by user_id and kept in step with finances.
+balances_collection = db['balances']
+# Users allowed to use the bot besides the admins, keyed by user_id.
+allowed_users_collection = db['allowed_users']
+
+# Multi-document transactions need a replica set (Atlas always has one).
+USE_TRANSACTIONS = os.getenv("MONGO_TRANSACTIONS", "1") == "1"
+
+TRANSACTION_FIELDS = {"_id": 0, "date": 1, "account": 1, "income": 1, "expenditure": 1, "remarks": 1}
+FIND_BATCH_SIZE = int(os.getenv("MONGO_FIND_BATCH_SIZE", "500"))
+INSERT_BATCH_SIZE = int(os.getenv("MONGO_INSERT_BATCH_SIZE", "1000"))
+
+
+async def ping() -> bool:
+    try:
+        await client.admin.command('ping')
+        print("Pinged your deployment. You successfully connected to MongoDB!")
+        return True
+    except Exception as e:
+        print(e)
+        return False
+
+
+async def ensure_indexes() -> None:
+    """Create the indexes used by per-user and statement queries. Safe to call on every startup."""
+    await finances_collection.create_index([("user_id", ASCENDING), ("date", ASCENDING)])
+    await finances_collection.create_index([("user_id", ASCENDING), ("account", ASCENDING), ("date", ASCENDING)])
+
+
+async def _run(callback):
+    if not USE_TRANSACTIONS:
+        return await callback(None)
+    async with client.start_session() as session:
+        return await session.with_transaction(callback)
+
+
+async def insert_transaction(finance_data: dict) -> float:
+    """Insert a transaction and update the user's balance document.
+
+    Both writes happen in one transaction, so the balance never drifts from
+    the stored transactions. Users without a balance document yet (e.g. with
+    history from before balance documents existed) get it rebuilt instead.
+
+    Args:
+        finance_data: The transaction document. Must contain "user_id",
+            "income" and "expenditure".
+
+    Returns:
+        The user's balance after the insert.
+    """
+    async def callback(session):
+        await finances_collection.insert_one(finance_data, session=session)
+        return await _add_to_balance(
+            finance_data["user_id"], finance_data.get("income", 0), finance_data.get("expenditure", 0), 1, session
+        )
+
+    return await _run(callback)
+
+
+async def insert_transactions(transactions: list) -> float:
+    """Insert many transactions of one user and update their balance document once.
+
+    Documents are written with insert_many in batches of MONGO_INSERT_BATCH_SIZE,
+    all in one transaction together with the balance update.
+
+    Args:
+        transactions: The transaction documents, all with the same "user_id".
+
+    Returns:
+        The user's balance after the insert.
+    """
+    user_id = transactions[0]["user_id"]
+
+    async def callback(session):
+        for start in range(0, len(transactions), INSERT_BATCH_SIZE):
+            await finances_collection.insert_many(transactions[start:start + INSERT_BATCH_SIZE], ordered=False, session=session)
+        return await _add_to_balance(
+            user_id,
+            sum(transaction.get("income", 0) for transaction in transactions),
+            sum(transaction.get("expenditure", 0) for transaction in transactions),
+            len(transactions),
+            session,
+        )
+
+    return await _run(callback)
+
+
+async def _add_to_balance(user_id: int, income: float, expenditure: float, count: int, session) -> float:
+    summary = await balances_collection.find_one_and_update(
+        {"_id": user_id},
+        {
+            "$inc": {
+                "total_income": income,
+                "total_expenditure": expenditure,
+                "transaction_count": count,
+                "version": 1,
+            },
+            "$set": {"updated_at": datetime.now()},
+        },
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if summary is None:
+        return await _rebuild(user_id, session)
+    return balance_of(summary)
+
+
+async def get_balance(user_id: int) -> float:
+    """Return the user's current balance from their balance document."""
+    summary = await balances_collection.find_one({"_id": user_id})
+    if summary is None:
+        return await rebuild_balance(user_id)
+    return balance_of(summary)
+
+
+async def get_data_version(user_id: int) -> int:
+    """Return a number that changes whenever the user's transactions change."""
+    summary = await balances_collection.find_one({"_id": user_id}, {"version": 1})
+    return summary.get("version", 0) if summary else 0
+
+
+def _match(user_id: int, start: datetime = None, end: datetime = None, account: str = None) -> dict:
+    match = {"user_id": user_id}
+    if start is not None or end is not None:
+        match["date"] = {}
+        if start is not None:
+            match["date"]["$gte"] = start
+        if end is not None:
+            match["date"]["$lt"] = end
+    if account is not None:
+        match["account"] = account
+    return match
+
+
+def find_transactions(user_id: int, start: datetime = None, end: datetime = None, projection: dict = None):
+    """Return an async cursor over the user's transactions in [start, end), oldest first.
+
+    Served by the (user_id, date) index as a range scan. Documents are
+    fetched from the server in batches as the cursor is iterated.
+    """
+    return finances_collection.find(_match(user_id, start, end), projection).sort("date", ASCENDING)
+
+
+async def aggregate(pipeline: list, session=None) -> list:
+    """Run an aggregation pipeline on the finances collection and return all results."""
+    cursor = await finances_collection.aggregate(pipeline, session=session)
+    return await cursor.to_list(None)
+
+
+async def _rebuild(user_id: int, session) -> float:
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {
+            "$group": {
+                "_id": None,
+                "total_income": {"$sum": {"$ifNull": ["$income", 0]}},
+                "total_expenditure": {"$sum": {"$ifNull": ["$expenditure", 0]}},
+                "transaction_count": {"$sum": 1},
+            }
+        },
+    ]
+    result = await aggregate(pipeline, session=session)
+    summary = {"total_income": 0, "total_expenditure": 0, "transaction_count": 0}
+    if result:
+        summary = {key: result[0][key] for key in summary}
+    summary["updated_at"] = datetime.now()
+    await balances_collection.update_one({"_id": user_id}, {"$set": summary, "$inc": {"version": 1}}, upsert=True, session=session)
+    return balance_of(summary)
+
+
+async def rebuild_balance(user_id: int) -> float:
+    """Recompute the user's balance document from their raw transactions.
+
+    Returns:
+        The recomputed balance.
+    """
+    balance = await _run(lambda session: _rebuild(user_id, session))
+    logging.info("Rebuilt balance for user %s: %s", user_id, balance)
+    return balance
+
+
+async def is_user_allowed(user_id: int) -> bool:
+    return await allowed_users_collection.find_one({"_id": user_id}, {"_id": 1}) is not None
+
+
+async def set_user_allowed(user_id: int, allowed: bool) -> None:
+    if allowed:
+        await allowed_users_collection.update_one(
+            {"_id": user_id}, {"$setOnInsert": {"added_at": datetime.now()}}, upsert=True
+        )
+    else:
+        await allowed_users_collection.delete_one({"_id": user_id})
+
+
+async def rebuild_all_balances() -> int:
+    """Rebuild the balance document of every user with transactions.
+
+    Returns:
+        The number of users rebuilt.
+    """
+    user_ids = await finances_collection.distinct("user_id")
+    for user_id in user_ids:
+        await rebuild_balance(user_id)
+    return len(user_ids)
+
+
+class MongoStore(TransactionStore):
+    """TransactionStore backed by the finances and balances collections."""
+
+    async def ping(self) -> bool:
+        return await ping()
+
+    async def ensure_indexes(self) -> None:
+        await ensure_indexes()
+
+    async def insert_transaction(self, finance_data: dict) -> float:
+        return await insert_transaction(finance_data)
+
+    async def insert_transactions(self, transactions: list) -> float:
+        return await insert_transactions(transactions)
+
+    async def get_balance(self, user_id: int) -> float:
+        return await get_balance(user_id)
+
+    async def rebuild_balance(self, user_id: int) -> float:
+        return await rebuild_balance(user_id)
+
+    async def get_data_version(self, user_id: int) -> int:
+        return await get_data_version(user_id)
+
+    async def is_user_allowed(self, user_id: int) -> bool:
+        return await is_user_allowed(user_id)
+
+    async def set_user_allowed(self, user_id: int, allowed: bool) -> None:
+        await set_user_allowed(user_id, allowed)
+
+    def find_transactions(self, user_id: int, start: datetime = None, end: datetime = None):
+        return find_transactions(user_id, start, end, projection=TRANSACTION_FIELDS).batch_size(FIND_BATCH_SIZE)
+
+    async def totals(self, user_id: int, start: datetime = None, end: datetime = None, account: str = None) -> dict:
+        pipeline = [
+            {"$match": _match(user_id, start, end, account)},
+            {
+                "$group": {
+                    "_id": None,
+                    "total_income": {"$sum": {"$ifNull": ["$income", 0]}},
+                    "total_expenditure": {"$sum": {"$ifNull": ["$expenditure", 0]}},
+                    "transaction_count": {"$sum": 1},
+                }
+            },
+        ]
+        result = await aggregate(pipeline)
+        if not result:
+            return dict(EMPTY_TOTALS)
+        result[0].pop("_id")
+        return result[0]
+
+    async def spend_per_account(self, user_id: int, start: datetime = None, end: datetime = None, limit: int = 5) -> list:
+        pipeline = [
+            {"$match": {**_match(user_id, start, end), "expenditure": {"$gt": 0}}},
+            {"$group": {"_id": "$account", "total_expenditure": {"$sum": "$expenditure"}}},
+            {"$sort": {"total_expenditure": -1}},
+            {"$limit": limit},
+        ]
+        return [
+            {"account": row["_id"], "total_expenditure": row["total_expenditure"]}
+            for row in await aggregate(pipeline)
+        ]
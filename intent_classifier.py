@@ -0,0 +1,148 @@
+from collections import Counter, defaultdict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import atexit
+import json
+import logging
+import math
+import os
+import queue
+import re
+
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "intent_model.json")
+# Labelled messages are appended here as training data. They contain users' raw
+# message text, so logging is off unless a path is set.
+INTENT_LOG_PATH = os.getenv("INTENT_LOG_PATH", "")
+# The log is rotated at this size, keeping INTENT_LOG_BACKUPS older files.
+INTENT_LOG_MAX_BYTES = int(os.getenv("INTENT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+INTENT_LOG_BACKUPS = int(os.getenv("INTENT_LOG_BACKUPS", "3"))
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+# Cosine similarities are close together, so they are scaled before the softmax.
+SOFTMAX_SCALE = 10.0
+
+
+def tokens(text: str) -> list:
+    """Lowercase words and word pairs, with every number replaced by <num>."""
+    words = ["<num>" if word[0].isdigit() else word for word in re.findall(r"\d[\d,.]*|[^\W\d_]+", text.lower())]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def _normalise(vector: dict) -> dict:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {key: value / norm for key, value in vector.items()} if norm else vector
+
+
+class IntentClassifier:
+    """A TF-IDF nearest-centroid classifier for message intents.
+
+    Each intent is represented by the normalised mean TF-IDF vector of its
+    training messages, and a message gets the intent whose centroid is most
+    similar. Predicting is a handful of dictionary lookups per token.
+
+    Args:
+        idf: Inverse document frequency per token.
+        centroids: Normalised centroid vector per intent.
+    """
+
+    def __init__(self, idf: dict, centroids: dict):
+        self.idf = idf
+        self.centroids = centroids
+
+    @classmethod
+    def train(cls, examples: list) -> "IntentClassifier":
+        """Fit the classifier on (text, intent) pairs."""
+        documents = [(Counter(tokens(text)), intent) for text, intent in examples]
+        document_frequency = Counter(token for counts, _ in documents for token in counts)
+        idf = {token: math.log((1 + len(documents)) / (1 + count)) + 1 for token, count in document_frequency.items()}
+        sums = defaultdict(lambda: defaultdict(float))
+        for counts, intent in documents:
+            for token, value in _normalise(cls._weigh(counts, idf)).items():
+                sums[intent][token] += value
+        return cls(idf, {intent: _normalise(dict(vector)) for intent, vector in sums.items()})
+
+    @staticmethod
+    def _weigh(counts: Counter, idf: dict) -> dict:
+        return {token: (1 + math.log(count)) * idf[token] for token, count in counts.items() if token in idf}
+
+    def predict(self, text: str) -> tuple:
+        """Return the most likely intent and its confidence between 0 and 1."""
+        vector = _normalise(self._weigh(Counter(tokens(text)), self.idf))
+        if not vector or not self.centroids:
+            return None, 0.0
+        scores = {
+            intent: sum(value * centroid.get(token, 0.0) for token, value in vector.items())
+            for intent, centroid in self.centroids.items()
+        }
+        best = max(scores, key=scores.get)
+        total = sum(math.exp(SOFTMAX_SCALE * (score - scores[best])) for score in scores.values())
+        return best, 1 / total
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"idf": self.idf, "centroids": self.centroids}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["idf"], data["centroids"])
+
+
+_classifier = None
+_loaded = False
+_label_logger = None
+
+
+def get_classifier():
+    """Return the trained classifier, or None if INTENT_MODEL_PATH does not exist yet."""
+    global _classifier, _loaded
+    if not _loaded:
+        _loaded = True
+        if os.path.exists(INTENT_MODEL_PATH):
+            try:
+                _classifier = IntentClassifier.load(INTENT_MODEL_PATH)
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"Could not load intent model from {INTENT_MODEL_PATH}: {e}")
+    return _classifier
+
+
+def classify(text: str, threshold: float = None):
+    """Return the intent of text if the local classifier is confident enough, otherwise None.
+
+    Args:
+        text: The user's message.
+        threshold: The minimum confidence. Defaults to INTENT_CONFIDENCE_THRESHOLD.
+    """
+    classifier = get_classifier()
+    if classifier is None or not text:
+        return None
+    intent, confidence = classifier.predict(text)
+    threshold = INTENT_CONFIDENCE_THRESHOLD if threshold is None else threshold
+    logging.debug("Local intent %s with confidence %.2f", intent, confidence)
+    return intent if confidence >= threshold else None
+
+
+def _get_label_logger() -> logging.Logger:
+    # Records go through a queue to a listener thread, so the event loop never waits on the file.
+    global _label_logger
+    if _label_logger is None:
+        handler = RotatingFileHandler(INTENT_LOG_PATH, maxBytes=INTENT_LOG_MAX_BYTES, backupCount=INTENT_LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, handler)
+        listener.start()
+        atexit.register(listener.stop)
+        logger = logging.getLogger("intent_labels")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(QueueHandler(records))
+        _label_logger = logger
+    return _label_logger
+
+
+def log_label(text: str, intent: str, source: str) -> None:
+    """Record a labelled message for training if INTENT_LOG_PATH is set. source is e.g. "llm" or "fast_parser"."""
+    if not INTENT_LOG_PATH or not text:
+        return
+    _get_label_logger().info(json.dumps({"text": text, "intent": intent, "source": source}))
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import os
+import random
+import time
+
+from metrics import LLM_CALLS, record_tokens, stage
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+if not GEMINI_API_KEY:
+    raise ValueError("Please set the GEMINI_API_KEY environment variable.")
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "250000"))
+# Rough size of a reply, used with the prompt length to reserve tokens before a request.
+LLM_RESPONSE_TOKEN_ESTIMATE = int(os.getenv("LLM_RESPONSE_TOKEN_ESTIMATE", "200"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "60"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Gemini models by system instruction; None is the model without one.
+_models = {}
+_override = None
+
+
+class LLMUnavailable(Exception):
+    """Gemini cannot be used right now: the circuit breaker is open, the rate limit
+    leaves no room before the timeout, or every retry failed."""
+
+
+class TokenBucket:
+    """Allows up to per_minute units a minute, refilled continuously.
+
+    The level may go below zero when a request uses more tokens than were
+    reserved for it; later requests then wait for it to refill.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+
+class RateLimiter:
+    """Shared requests-per-minute and tokens-per-minute limits for Gemini."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    async def acquire(self, tokens: int, timeout: float) -> None:
+        """Wait for a request slot and tokens.
+
+        Raises:
+            LLMUnavailable: If they will not be available within timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait == 0:
+                # No await between the check and the take, so concurrent callers cannot both pass.
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                return
+            if time.monotonic() + wait > deadline:
+                raise LLMUnavailable(f"Gemini rate limit reached, next slot in {wait:.1f} seconds")
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Charge the difference between the tokens reserved for a request and those it used."""
+        self.tokens.take(used - reserved)
+
+
+class CircuitBreaker:
+    """Stops calling Gemini after repeated failures.
+
+    After failure_threshold failures in a row the breaker opens and calls
+    fail straight away. Once reset_seconds have passed, a single call is let
+    through: it closes the breaker if it succeeds and reopens it if not.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_seconds:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logging.info("Gemini is reachable again, closing the circuit breaker")
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+            logging.warning("Gemini failed %d times in a row, opening the circuit breaker for %s seconds",
+                            self.failures, self.reset_seconds)
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+
+# The semaphore is created lazily so it binds to the event loop that runs the bot.
+_semaphore = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def get_model(system_instruction: str = None):
+    """Return the shared Gemini model for system_instruction, configuring the client on first use.
+
+    google.generativeai pulls in grpc and protobuf, which take a noticeable
+    part of startup, so it is only imported when the first model is needed;
+    the bot does that in a thread from post_init.
+    One model is built per system instruction and reused for the life of the
+    process, so static instructions are set up once rather than per call.
+    """
+    if _override is not None:
+        return _override
+    model = _models.get(system_instruction)
+    if model is None:
+        import google.generativeai as genai
+        if not _models:
+            genai.configure(api_key=GEMINI_API_KEY)
+        model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=system_instruction)
+        _models[system_instruction] = model
+    return model
+
+
+def set_model(model) -> None:
+    """Use model instead of the Gemini ones, e.g. a stub in benchmarks."""
+    global _override
+    _override = model
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # google.api_core errors carry the HTTP status as code.
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+
+async def _generate(prompt: str, system_instruction: str = None, **kwargs):
+    async with _get_semaphore():
+        return await get_model(system_instruction).generate_content_async(prompt, **kwargs)
+
+
+async def generate_text(prompt: str, system_instruction: str = None, name: str = "other",
+                        timeout: float = None, **kwargs) -> str:
+    """Generate text with Gemini without blocking the event loop.
+
+    Calls share a rate limiter (LLM_REQUESTS_PER_MINUTE and
+    LLM_TOKENS_PER_MINUTE) and at most LLM_MAX_CONCURRENCY are in flight at
+    once. Timeouts, connection errors, 429s and 5xx responses are retried
+    with jittered exponential backoff, and repeated failures open a circuit
+    breaker so callers fail fast instead of queueing on a struggling API. The
+    timeout covers the whole call, including waits and retries.
+
+    Static instructions and examples belong in system_instruction, which is
+    built into a model once per process; only the per-request part goes in
+    prompt. Token usage is logged and counted per name.
+
+    Args:
+        prompt: The prompt to send to the model.
+        system_instruction: Fixed instructions for the model, if any.
+        name: What the call is for, e.g. "extract", in logs and metrics.
+        timeout: Seconds to wait before giving up. Defaults to LLM_TIMEOUT_SECONDS.
+        **kwargs: Extra arguments passed to generate_content_async.
+
+    Returns:
+        The stripped response text.
+
+    Raises:
+        LLMUnavailable: If the breaker is open, the rate limit or retries would
+            run past the timeout, or every attempt failed.
+    """
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    if not breaker.allow():
+        LLM_CALLS.labels("rejected").inc()
+        raise LLMUnavailable("Gemini circuit breaker is open")
+
+    # About four characters per token.
+    reserved = (len(prompt) + len(system_instruction or "")) // 4 + LLM_RESPONSE_TOKEN_ESTIMATE
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            await limiter.acquire(reserved, deadline - time.monotonic())
+            started = time.perf_counter()
+            with stage("llm"):
+                response = await asyncio.wait_for(_generate(prompt, system_instruction, **kwargs),
+                                                  timeout=deadline - time.monotonic())
+        except LLMUnavailable:
+            breaker.probing = False
+            LLM_CALLS.labels("rejected").inc()
+            raise
+        except asyncio.CancelledError:
+            breaker.probing = False
+            raise
+        except Exception as e:
+            if not _is_retryable(e):
+                # Gemini answered, so the API itself is up; the request was bad.
+                breaker.record_success()
+                LLM_CALLS.labels("failed").inc()
+                raise
+            breaker.record_failure()
+            delay = LLM_RETRY_BASE_SECONDS * 2 ** attempt
+            delay = random.uniform(delay / 2, delay)
+            if attempt == LLM_MAX_RETRIES or breaker.is_open or time.monotonic() + delay >= deadline:
+                logging.error(f"Gemini request failed after {attempt + 1} attempts: {e!r}")
+                LLM_CALLS.labels("failed").inc()
+                raise LLMUnavailable(f"Gemini request failed: {e!r}") from e
+            logging.warning(f"Gemini request failed ({e!r}), retrying in {delay:.1f} seconds")
+            LLM_CALLS.labels("retried").inc()
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        LLM_CALLS.labels("ok").inc()
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            cached = getattr(usage, "cached_content_token_count", 0) or 0
+            logging.info("Gemini %s call: %d prompt tokens (%d cached), %d response tokens, %.0f ms", name,
+                         usage.prompt_token_count, cached, usage.candidates_token_count,
+                         (time.perf_counter() - started) * 1000)
+            record_tokens(name, usage.prompt_token_count, usage.candidates_token_count)
+            limiter.settle(reserved, usage.total_token_count)
+        return response.text.strip()
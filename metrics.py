@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import json
+import logging
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from telegram.request import HTTPXRequest
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "expensebot_stage_seconds", "Time spent in one stage of handling an update.", ["stage"], buckets=LATENCY_BUCKETS
+)
+UPDATE_SECONDS = Histogram(
+    "expensebot_update_seconds", "Time to handle an update end to end.", ["handler"], buckets=LATENCY_BUCKETS
+)
+UPDATES = Counter("expensebot_updates_total", "Updates handled.", ["handler", "outcome"])
+LLM_TOKENS = Counter("expensebot_llm_tokens_total", "Gemini tokens used, by call and by prompt and response.", ["call", "kind"])
+LLM_CALLS = Counter("expensebot_llm_calls_total", "Gemini call attempts, by outcome.", ["outcome"])
+
+# The trace of the update being handled. Each update runs in its own task, so traces never mix.
+_trace = ContextVar("trace", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one stage of the current update, e.g. "extract" or "store"."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        trace = _trace.get()
+        if trace is not None:
+            trace["stages"][name] = trace["stages"].get(name, 0) + elapsed * 1000
+
+
+def record_tokens(name: str, prompt_tokens: int, response_tokens: int) -> None:
+    LLM_TOKENS.labels(name, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(name, "response").inc(response_tokens)
+    trace = _trace.get()
+    if trace is not None:
+        trace["tokens"]["prompt"] += prompt_tokens
+        trace["tokens"]["response"] += response_tokens
+
+
+def traced(handler):
+    """Time a handler and log one JSON line per update with its stage timings and token counts.
+
+    Handlers called from another traced handler (e.g. get_balance from
+    handle_message) are part of the caller's trace.
+    """
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(update, context, *args, **kwargs):
+        if _trace.get() is not None:
+            return await handler(update, context, *args, **kwargs)
+        trace = {"stages": {}, "tokens": {"prompt": 0, "response": 0}}
+        token = _trace.set(trace)
+        outcome = "ok"
+        started = time.perf_counter()
+        try:
+            return await handler(update, context, *args, **kwargs)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _trace.reset(token)
+            UPDATE_SECONDS.labels(name).observe(elapsed)
+            UPDATES.labels(name, outcome).inc()
+            user = getattr(update, "effective_user", None)
+            logging.info(json.dumps({
+                "event": "update",
+                "handler": name,
+                "update_id": getattr(update, "update_id", None),
+                "user_id": user.id if user is not None else None,
+                "outcome": outcome,
+                "total_ms": round(elapsed * 1000, 1),
+                "stages": {key: round(value, 1) for key, value in trace["stages"].items()},
+                "tokens": trace["tokens"],
+            }))
+
+    return wrapper
+
+
+class TimedRequest(HTTPXRequest):
+    """HTTPXRequest that records every Bot API call as the "telegram" stage."""
+
+    async def do_request(self, *args, **kwargs):
+        with stage("telegram"):
+            return await super().do_request(*args, **kwargs)
+
+
+def render() -> tuple:
+    """Return the metrics in the Prometheus text format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
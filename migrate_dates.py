@@ -0,0 +1,91 @@
+"""Convert string "date" fields in the finances collection to BSON dates.
+
+The migration runs in batches ordered by _id and records its progress in the
+migrations collection, so it can be stopped and re-run at any time.
+
+Usage:
+    python migrate_dates.py [--batch-size 1000] [--dry-run] [--restart]
+"""
+from datetime import datetime
+import argparse
+import asyncio
+import logging
+from pymongo import ASCENDING, UpdateOne
+
+from finances_store import db, ensure_indexes, finances_collection
+
+logging.basicConfig(level=logging.INFO)
+
+MIGRATION_ID = "finances_string_dates"
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%d-%m-%Y', '%d/%m/%Y']
+
+migrations_collection = db['migrations']
+
+
+def parse_date(value: str):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format)
+        except ValueError:
+            continue
+    return None
+
+
+async def migrate(batch_size: int, dry_run: bool = False, restart: bool = False) -> int:
+    """Convert string dates batch by batch, resuming from the last checkpoint.
+
+    Returns:
+        The number of documents converted in this run.
+    """
+    if restart:
+        await migrations_collection.delete_one({"_id": MIGRATION_ID})
+    checkpoint = await migrations_collection.find_one({"_id": MIGRATION_ID}) or {}
+    last_id = checkpoint.get("last_id")
+    converted = 0
+
+    while True:
+        query = {"date": {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await finances_collection.find(query, {"date": 1}).sort("_id", ASCENDING).limit(batch_size).to_list(None)
+        if not batch:
+            break
+
+        updates = []
+        for record in batch:
+            parsed = parse_date(record["date"])
+            if parsed is None:
+                logging.warning("Skipping %s: unrecognised date %r", record["_id"], record["date"])
+                continue
+            # Match on the string type again so concurrent writers are never overwritten.
+            updates.append(UpdateOne({"_id": record["_id"], "date": {"$type": "string"}}, {"$set": {"date": parsed}}))
+
+        last_id = batch[-1]["_id"]
+        if not dry_run:
+            if updates:
+                await finances_collection.bulk_write(updates, ordered=False)
+            await migrations_collection.update_one(
+                {"_id": MIGRATION_ID},
+                {"$set": {"last_id": last_id, "updated_at": datetime.now()}, "$inc": {"converted": len(updates)}},
+                upsert=True,
+            )
+        converted += len(updates)
+        logging.info("Converted %d documents so far (last _id %s)", converted, last_id)
+
+    return converted
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint and scan from the start.")
+    args = parser.parse_args()
+
+    await ensure_indexes()
+    converted = await migrate(args.batch_size, dry_run=args.dry_run, restart=args.restart)
+    print(f"Converted {converted} documents.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,29 @@
+from typing import Literal, Optional
+import datetime
+from pydantic import BaseModel
+
+INTENTS = ["add_transaction", "get_balance", "get_statement", "general_inquiry"]
+ACCOUNTS = ["Home", "Clothes", "Trips", "Labor", "EMIs", "Salary", "Freelance", "Other"]
+
+
+class TransactionData(BaseModel):
+    amount: Optional[float] = None
+    account: Literal["Home", "Clothes", "Trips", "Labor", "EMIs", "Salary", "Freelance", "Other"] = "Other"
+    transaction_type: Literal["Income", "Expense"] = "Expense"
+    date: Optional[datetime.date] = None
+
+
+QUERY_TYPES = ["balance", "spend_on_date", "spend_by_account", "top_account", "range_summary", "none"]
+
+
+class AnalyticsQuery(BaseModel):
+    query_type: Literal["balance", "spend_on_date", "spend_by_account", "top_account", "range_summary", "none"] = "none"
+    account: Optional[Literal["Home", "Clothes", "Trips", "Labor", "EMIs", "Salary", "Freelance", "Other"]] = None
+    start_date: Optional[datetime.date] = None
+    end_date: Optional[datetime.date] = None
+
+
+class MessageExtraction(BaseModel):
+    intent: Literal["add_transaction", "get_balance", "get_statement", "general_inquiry"] = "general_inquiry"
+    transactions: list[TransactionData] = []
+    query: Optional[AnalyticsQuery] = None
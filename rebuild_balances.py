@@ -0,0 +1,26 @@
+"""Recompute per-user balance documents from the raw finances collection.
+
+Usage:
+    python rebuild_balances.py             # every user
+    python rebuild_balances.py <user_id>   # a single user
+"""
+import asyncio
+import logging
+import sys
+
+from finances_store import rebuild_all_balances, rebuild_balance
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def main():
+    if len(sys.argv) > 1:
+        balance = await rebuild_balance(int(sys.argv[1]))
+        print(f"Balance for user {sys.argv[1]}: {balance}")
+    else:
+        count = await rebuild_all_balances()
+        print(f"Rebuilt balances for {count} users.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
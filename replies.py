@@ -0,0 +1,114 @@
+from llm_client import generate_text
+from string import Formatter
+import logging
+import os
+
+from cache import LRUCache
+
+# Fixed system messages. Placeholders in braces are filled in locally.
+TEMPLATES = {
+    "unauthorized": "Unauthorized access!",
+    "user_allowed": "User {user_id} can now use the bot.",
+    "user_disallowed": "User {user_id} can no longer use the bot.",
+    "allow_usage": "Send the Telegram user id after the command, e.g. /allow 123456789.",
+    "allowlist_unsupported": "The allowlist needs the mongo or sqlite storage backend.",
+    "start": "Hey, {name}! How are you doing today? I'm here to help you track your expenses and income. Send me a message with the details of your transaction (e.g., 'Spent 500 on groceries').",
+    "entry_added": "Entry added successfully!",
+    "entries_added": "Added {count} entries: {summary}.",
+    "balance_negative": "Your current available balance is {balance}. Please be careful with your expenses.",
+    "balance_zero": "Your current available balance is 0. Track your expenses regularly to stay on top of your finances.",
+    "balance_low": "Your current available balance is {balance}. Consider saving a little more.",
+    "balance_high": "Your current available balance is {balance}. Great job on saving!",
+    "balance_failed": "Failed to fetch the balance. Please try again later.",
+    "statement_caption": "Here is your statement for {period}.",
+    "statement_empty": "No transactions found for {period}.",
+    "statement_failed": "Failed to generate the statement. Please try again later.",
+    "amount_missing": "I couldn't extract the amount from your input. Please try again.",
+    "invalid_input": "Sorry, I couldn't understand that. Please rephrase your input.",
+    "error": "Error: {error}",
+    "unexpected_error": "An unexpected error occurred. Please try again later.",
+    "too_many_messages": "You sent too many messages at once, so this one was not saved. Please send it again in a moment.",
+    "llm_unavailable": "I can't read free-form messages right now. Entries like 'Spent 500 on groceries', /getbalance and /getstatement still work, or try again in a few minutes.",
+    "import_done": "Imported {count} transactions ({skipped} rows skipped).",
+    "import_empty": "I couldn't find any transactions in that file.",
+    "import_failed": "I couldn't import that file: {error}",
+}
+
+DEFAULT_LANGUAGE = "en"
+SAVINGS_TARGET = 20000
+
+# Paraphrased templates keyed by (template key, language).
+paraphrase_cache = LRUCache(
+    maxsize=int(os.getenv("REPLY_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("REPLY_CACHE_TTL_SECONDS", "86400")),
+)
+
+
+def balance_template(balance: float) -> str:
+    """Return the template key that matches the size of the balance."""
+    if balance < 0:
+        return "balance_negative"
+    if balance == 0:
+        return "balance_zero"
+    if balance < SAVINGS_TARGET:
+        return "balance_low"
+    return "balance_high"
+
+
+def _language(language_code: str) -> str:
+    return (language_code or DEFAULT_LANGUAGE).split("-")[0].lower()
+
+
+def _placeholders(template: str) -> set:
+    return {name for _, name, _, _ in Formatter().parse(template) if name}
+
+
+async def _paraphrase(key: str, language: str) -> str:
+    template = TEMPLATES[key]
+    cache_key = (key, language)
+    cached = paraphrase_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    prompt = f"""
+    Rewrite the following message from a friendly expense tracking bot in the language with the code "{language}".
+    Keep it short and polite. Keep every placeholder in curly braces, such as {{balance}}, exactly as it is.
+    Don't mention any currency symbols. Return only the rewritten message.
+
+    Message: {template}
+    """
+    placeholders = _placeholders(template)
+    try:
+        paraphrased = await generate_text(prompt, name="paraphrase")
+        if _placeholders(paraphrased) != placeholders:
+            raise ValueError("placeholders changed")
+        # Also rejects stray braces and format specs that would break render_reply.
+        paraphrased.format(**{name: "0" for name in placeholders})
+    except Exception as e:
+        logging.error(f"Error paraphrasing reply {key}, using the default text: {e}")
+        paraphrased = template
+    paraphrase_cache.set(cache_key, paraphrased)
+    return paraphrased
+
+
+async def render_reply(key: str, language_code: str = None, **values) -> str:
+    """Render a fixed system message without a per-reply LLM call.
+
+    English replies are rendered straight from TEMPLATES. Other languages are
+    paraphrased by Gemini once per template and served from paraphrase_cache
+    afterwards.
+
+    Args:
+        key: The template key in TEMPLATES.
+        language_code: The user's Telegram language code, e.g. "en" or "hi".
+        **values: Values for the template placeholders.
+
+    Returns:
+        The rendered reply text.
+    """
+    language = _language(language_code)
+    if language == DEFAULT_LANGUAGE:
+        template = TEMPLATES[key]
+    else:
+        template = await _paraphrase(key, language)
+    return template.format(**values)
@@ -0,0 +1,166 @@
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import pandas as pd
+
+COLUMNS = ["Date", "Account", "Income", "Expenditure", "Remarks"]
+SHEET_REFRESH_SECONDS = float(os.getenv("SHEET_REFRESH_SECONDS", "30"))
+# Incremental refreshes only see new rows; a periodic full reload picks up edits to old ones.
+SHEET_FULL_RELOAD_SECONDS = float(os.getenv("SHEET_FULL_RELOAD_SECONDS", "3600"))
+
+
+def _empty_frame(columns: list) -> pd.DataFrame:
+    return _typed(pd.DataFrame(columns=columns))
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['Income'] = pd.to_numeric(df['Income'], errors='coerce').fillna(0)
+    df['Expenditure'] = pd.to_numeric(df['Expenditure'], errors='coerce').fillna(0)
+    return df
+
+
+class SheetMirror:
+    """A local, typed copy of the expense sheet.
+
+    The first read downloads the whole sheet. Later refreshes only fetch the
+    rows after the last one mirrored. Rows that a BufferedSheetWriter has
+    accepted but not written yet are included in frame() as pending rows,
+    and once written they are applied locally without re-reading the sheet.
+
+    Args:
+        sheet: The gspread worksheet holding the transactions.
+        cache_path: Optional file the mirror is saved to, so restarts only
+            fetch rows added since the last run.
+        refresh_interval: Minimum seconds between incremental refreshes.
+    """
+
+    def __init__(self, sheet, cache_path: str = None, refresh_interval: float = SHEET_REFRESH_SECONDS):
+        self.sheet = sheet
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.header = None
+        self.row_count = 0
+        # Changes whenever frame() would return different rows.
+        self.version = 0
+        self._frame = _empty_frame(COLUMNS)
+        self._pending = []
+        self._last_refresh = 0
+        self._last_reload = 0
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "rb") as f:
+                saved = pickle.load(f)
+            self.header, self.row_count, self._frame = saved["header"], saved["row_count"], saved["frame"]
+            self._last_reload = time.monotonic()
+            logging.info("Loaded %d sheet rows from %s", self.row_count, self.cache_path)
+        except Exception as e:
+            logging.error(f"Could not load sheet mirror from {self.cache_path}: {e}")
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"header": self.header, "row_count": self.row_count, "frame": self._frame}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _rows_to_frame(self, rows: list) -> pd.DataFrame:
+        # The Sheets API trims trailing empty cells, so pad every row to the header width.
+        width = len(self.header)
+        rows = [(row + [""] * width)[:width] for row in rows]
+        return _typed(pd.DataFrame(rows, columns=self.header))
+
+    def reload(self) -> None:
+        """Download the whole sheet again."""
+        with self._lock:
+            all_data = self.sheet.get_all_values()
+            self.header = all_data[0] if all_data else list(COLUMNS)
+            self._frame = self._rows_to_frame(all_data[1:])
+            self.row_count = len(all_data) - 1 if all_data else 0
+            self.version += 1
+            self._last_refresh = self._last_reload = time.monotonic()
+            self._save()
+
+    def refresh(self, force: bool = False) -> None:
+        """Fetch rows added to the sheet since the last refresh.
+
+        Args:
+            force: Refresh even if the last one was less than refresh_interval ago.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.header is None or now - self._last_reload >= SHEET_FULL_RELOAD_SECONDS:
+                self.reload()
+                return
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return
+            # Row 1 is the header, so the first unmirrored row is row_count + 2.
+            first_row = self.row_count + 2
+            new_rows = self.sheet.get(f"A{first_row}:{_column_letter(len(self.header))}")
+            self._last_refresh = now
+            if new_rows:
+                self._frame = pd.concat([self._frame, self._rows_to_frame(new_rows)], ignore_index=True)
+                self.row_count += len(new_rows)
+                self.version += 1
+                self._save()
+
+    def frame(self) -> pd.DataFrame:
+        """Return the mirrored transactions with Date, Income and Expenditure typed."""
+        with self._lock:
+            self.refresh()
+            if not self._pending:
+                return self._frame
+            return pd.concat([self._frame, self._rows_to_frame(self._pending)], ignore_index=True)
+
+    def add_pending(self, row: list) -> None:
+        """Show a row that has been accepted but not written to the sheet yet."""
+        with self._lock:
+            self._pending.append([str(value) for value in row])
+            self.version += 1
+
+    def confirm_pending(self, count: int, response: dict) -> None:
+        """Mark the oldest count pending rows as written by a Sheets append call."""
+        with self._lock:
+            rows, self._pending = self._pending[:count], self._pending[count:]
+            self.version += 1
+            self._apply_written(rows, response)
+
+    def discard_pending(self, count: int) -> None:
+        """Drop the oldest count pending rows, which will not be written."""
+        with self._lock:
+            self._pending = self._pending[count:]
+            self.version += 1
+
+    def _apply_written(self, rows: list, response: dict) -> None:
+        if self.header is not None and _written_row(response) == self.row_count + 2:
+            rows = [[str(value) for value in row] for row in rows]
+            self._frame = pd.concat([self._frame, self._rows_to_frame(rows)], ignore_index=True)
+            self.row_count += len(rows)
+            self._save()
+        else:
+            # Someone else appended in between; pick their rows and ours up in order.
+            self.refresh(force=True)
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _written_row(response: dict):
+    # e.g. {"updates": {"updatedRange": "Sheet1!A12:E12", ...}}
+    updated_range = (response or {}).get("updates", {}).get("updatedRange", "")
+    match = re.search(r"![A-Z]+(\d+)", updated_range)
+    return int(match.group(1)) if match else None
@@ -0,0 +1,193 @@
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+from gspread.exceptions import APIError
+from requests.exceptions import ConnectionError, Timeout
+
+from sheet_mirror import SheetMirror
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SHEET_BATCH_SIZE = int(os.getenv("SHEET_BATCH_SIZE", "50"))
+SHEET_FLUSH_SECONDS = float(os.getenv("SHEET_FLUSH_SECONDS", "5"))
+SHEET_SPILL_PATH = os.getenv("SHEET_SPILL_PATH", "sheet_pending.jsonl")
+SHEET_MAX_RETRIES = int(os.getenv("SHEET_MAX_RETRIES", "5"))
+SHEET_RETRY_BASE_SECONDS = float(os.getenv("SHEET_RETRY_BASE_SECONDS", "1"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, Timeout)):
+        return True
+    if isinstance(error, APIError):
+        return getattr(error.response, "status_code", None) in RETRYABLE_STATUS_CODES
+    return False
+
+
+class BufferedSheetWriter:
+    """Coalesces sheet appends into append_rows batches.
+
+    append() records the row in a local spill file (flushed to disk) before
+    returning, so an acknowledged entry survives a crash. A background thread
+    writes pending rows, in append_rows calls of at most SHEET_BATCH_SIZE
+    rows, once that many are waiting or SHEET_FLUSH_SECONDS have passed.
+    Quota and server errors are retried with jittered exponential backoff;
+    rows that still fail stay pending for the next flush. Rows the sheet
+    rejects outright are moved to a dead-letter file next to the spill file. Pending rows are replayed from the spill file
+    on startup, so a crash between a successful write and the spill file
+    update can write a batch twice, but never loses one.
+
+    Each process needs a spill file of its own: the file is locked while the
+    writer is open, and a second writer on the same file fails at once
+    rather than replaying and truncating the other's pending rows.
+
+    Args:
+        mirror: The SheetMirror of the target sheet. Pending rows are shown
+            in its frame() until they are written.
+        spill_path: The file pending rows are kept in.
+        batch_size: Rows that trigger an immediate flush, and the most sent in one request.
+        flush_interval: Maximum seconds a row waits before being flushed.
+    """
+
+    def __init__(self, mirror: SheetMirror, spill_path: str = SHEET_SPILL_PATH,
+                 batch_size: int = SHEET_BATCH_SIZE, flush_interval: float = SHEET_FLUSH_SECONDS):
+        self.mirror = mirror
+        self.sheet = mirror.sheet
+        self.spill_path = spill_path
+        # Rows the sheet rejected, kept with the error for someone to look at.
+        self.dead_letter_path = os.path.splitext(spill_path)[0] + "_failed.jsonl"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._lock_file = self._lock_spill()
+        self._replay()
+        self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _lock_spill(self):
+        lock_file = open(self.spill_path + ".lock", "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                raise RuntimeError(
+                    f"{self.spill_path} is in use by another process. Give each process its own SHEET_SPILL_PATH."
+                )
+        return lock_file
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.spill_path):
+            return
+        with open(self.spill_path) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    self._pending.append(row)
+                    self.mirror.add_pending(row)
+        if self._pending:
+            logging.info("Replaying %d unwritten sheet rows from %s", len(self._pending), self.spill_path)
+            self._wakeup.set()
+
+    def _rewrite_spill(self) -> None:
+        tmp_path = self.spill_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for row in self._pending:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spill_path)
+
+    def append(self, row: list) -> None:
+        """Accept a row for writing. Returns once the row is safely on local disk."""
+        self.append_many([row])
+
+    def append_many(self, rows: list) -> None:
+        """Accept several rows for writing with a single write to the spill file."""
+        with self._lock:
+            with open(self.spill_path, "a") as f:
+                f.writelines(json.dumps(row) + "\n" for row in rows)
+                f.flush()
+                os.fsync(f.fileno())
+            for row in rows:
+                self._pending.append(row)
+                self.mirror.add_pending(row)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def _append_with_retry(self, rows: list) -> dict:
+        for attempt in range(SHEET_MAX_RETRIES + 1):
+            try:
+                return self.sheet.append_rows(rows)
+            except Exception as e:
+                if not _is_retryable(e) or attempt == SHEET_MAX_RETRIES:
+                    raise
+                delay = SHEET_RETRY_BASE_SECONDS * 2 ** attempt
+                delay = random.uniform(delay / 2, delay)
+                logging.warning(f"Sheets append failed ({e}), retrying in {delay:.1f} seconds")
+                time.sleep(delay)
+
+    def _dead_letter(self, rows: list, error: Exception) -> None:
+        with open(self.dead_letter_path, "a") as f:
+            f.writelines(json.dumps({"row": row, "error": str(error)}) + "\n" for row in rows)
+            f.flush()
+            os.fsync(f.fileno())
+        logging.error(f"Sheets rejected {len(rows)} rows ({error}), moved them to {self.dead_letter_path}")
+
+    def flush(self) -> None:
+        """Write all pending rows to the sheet now, batch_size rows per request.
+
+        Each batch is confirmed as soon as it is written. A batch the sheet
+        rejects outright (not a quota or server error) is moved to the
+        dead-letter file rather than retried forever.
+        """
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    rows = self._pending[:self.batch_size]
+                if not rows:
+                    return
+                try:
+                    response = self._append_with_retry(rows)
+                except Exception as e:
+                    if _is_retryable(e):
+                        logging.error(f"Could not write {len(rows)} rows to the sheet, keeping them pending: {e}")
+                        return
+                    self._dead_letter(rows, e)
+                    response = None
+                with self._lock:
+                    self._pending = self._pending[len(rows):]
+                    self._rewrite_spill()
+                if response is None:
+                    self.mirror.discard_pending(len(rows))
+                else:
+                    self.mirror.confirm_pending(len(rows), response)
+                    logging.info("Wrote %d rows to the sheet", len(rows))
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """Flush pending rows and stop the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval)
+        self.flush()
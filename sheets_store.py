@@ -0,0 +1,120 @@
+from datetime import datetime
+import asyncio
+import os
+import gspread
+from oauth2client.service_account import ServiceAccountCredentials
+import pandas as pd
+
+from sheet_mirror import SheetMirror
+from sheet_writer import SHEET_SPILL_PATH, BufferedSheetWriter
+from storage import EMPTY_TOTALS, TransactionStore, balance_of
+
+SHEETS_CREDENTIALS_FILE = os.getenv("SHEETS_CREDENTIALS_FILE", "sheets_key.json")
+SHEET_NAME = os.getenv("SHEET_NAME", "Expense Sheet")
+SCOPE = ['https://spreadsheets.google.com/feeds',
+         'https://www.googleapis.com/auth/drive',
+         'https://www.googleapis.com/auth/spreadsheets']
+
+
+def open_sheet():
+    """Open the first worksheet of the expense spreadsheet with the service account key.
+
+    Raises:
+        FileNotFoundError: If the key file does not exist.
+    """
+    if not os.path.exists(SHEETS_CREDENTIALS_FILE):
+        raise FileNotFoundError("Credential file not found. Please provide a valid JSON keyfile.")
+    creds = ServiceAccountCredentials.from_json_keyfile_name(SHEETS_CREDENTIALS_FILE, SCOPE)
+    return gspread.authorize(creds).open(SHEET_NAME).sheet1
+
+
+class SheetsStore(TransactionStore):
+    """TransactionStore on the Google Sheet, read through a SheetMirror.
+
+    The sheet has no user column; it holds a single user's transactions, so
+    user_id is ignored. Queries run on the mirror's DataFrame in a worker
+    thread, since a read may first fetch new rows from the sheet. Inserts go
+    through a BufferedSheetWriter and show up in reads straight away.
+
+    Args:
+        mirror: The mirror of the expense sheet.
+        writer: The writer appends are queued on.
+    """
+
+    def __init__(self, mirror: SheetMirror, writer: BufferedSheetWriter):
+        self.mirror = mirror
+        self.writer = writer
+
+    @classmethod
+    def from_env(cls, spill_path: str = SHEET_SPILL_PATH) -> "SheetsStore":
+        """Open the sheet from the environment settings.
+
+        Args:
+            spill_path: The writer's spill file. Each process needs its own.
+        """
+        mirror = SheetMirror(open_sheet(), cache_path=os.getenv("SHEET_MIRROR_PATH"))
+        return cls(mirror, BufferedSheetWriter(mirror, spill_path=spill_path))
+
+    async def _frame(self, start: datetime = None, end: datetime = None, account: str = None) -> pd.DataFrame:
+        df = await asyncio.to_thread(self.mirror.frame)
+        if start is not None:
+            df = df[df['Date'] >= start]
+        if end is not None:
+            df = df[df['Date'] < end]
+        if account is not None:
+            df = df[df['Account'] == account]
+        return df
+
+    async def ping(self) -> bool:
+        return True
+
+    async def insert_transaction(self, finance_data: dict) -> float:
+        return await self.insert_transactions([finance_data])
+
+    async def insert_transactions(self, transactions: list) -> float:
+        rows = [
+            [
+                finance_data["date"].strftime('%Y-%m-%d'),
+                finance_data.get("account"),
+                finance_data.get("income", 0),
+                finance_data.get("expenditure", 0),
+                finance_data.get("remarks", ""),
+            ]
+            for finance_data in transactions
+        ]
+        await asyncio.to_thread(self.writer.append_many, rows)
+        return await self.get_balance(transactions[0].get("user_id"))
+
+    async def get_balance(self, user_id: int) -> float:
+        return balance_of(await self.totals(user_id))
+
+    async def get_data_version(self, user_id: int) -> int:
+        # A cache hit reads nothing else from the store, so pick up rows added elsewhere here.
+        await asyncio.to_thread(self.mirror.refresh)
+        return self.mirror.version
+
+    async def find_transactions(self, user_id: int, start: datetime = None, end: datetime = None):
+        df = (await self._frame(start, end)).sort_values('Date', kind='stable')
+        for row in df.itertuples(index=False):
+            yield {
+                "date": row.Date.to_pydatetime() if pd.notna(row.Date) else "",
+                "account": row.Account,
+                "income": row.Income,
+                "expenditure": row.Expenditure,
+                "remarks": row.Remarks,
+            }
+
+    async def totals(self, user_id: int, start: datetime = None, end: datetime = None, account: str = None) -> dict:
+        df = await self._frame(start, end, account)
+        if df.empty:
+            return dict(EMPTY_TOTALS)
+        return {
+            "total_income": float(df['Income'].sum()),
+            "total_expenditure": float(df['Expenditure'].sum()),
+            "transaction_count": len(df),
+        }
+
+    async def spend_per_account(self, user_id: int, start: datetime = None, end: datetime = None, limit: int = 5) -> list:
+        df = await self._frame(start, end)
+        spend = df[df['Expenditure'] > 0].groupby('Account')['Expenditure'].sum().nlargest(limit)
+        return [{"account": account, "total_expenditure": float(total)} for account, total in spend.items()]
@@ -0,0 +1,238 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import asyncio
+import logging
+import os
+import sqlite3
+
+from storage import EMPTY_TOTALS, TransactionStore, balance_of
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "finances.db")
+SQLITE_FETCH_SIZE = int(os.getenv("SQLITE_FETCH_SIZE", "500"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS finances (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    account TEXT,
+    income REAL NOT NULL DEFAULT 0,
+    expenditure REAL NOT NULL DEFAULT 0,
+    remarks TEXT
+);
+CREATE INDEX IF NOT EXISTS finances_user_date ON finances (user_id, date);
+CREATE INDEX IF NOT EXISTS finances_user_account_date ON finances (user_id, account, date);
+CREATE TABLE IF NOT EXISTS balances (
+    user_id INTEGER PRIMARY KEY,
+    total_income REAL NOT NULL DEFAULT 0,
+    total_expenditure REAL NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS allowed_users (
+    user_id INTEGER PRIMARY KEY,
+    added_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _where(user_id: int, start: datetime = None, end: datetime = None, account: str = None) -> tuple:
+    # Dates are stored as YYYY-MM-DD text, which sorts and compares like the dates themselves.
+    clauses, params = ["user_id = ?"], [user_id]
+    if start is not None:
+        clauses.append("date >= ?")
+        params.append(start.strftime(DATE_FORMAT))
+    if end is not None:
+        clauses.append("date < ?")
+        params.append(end.strftime(DATE_FORMAT))
+    if account is not None:
+        clauses.append("account = ?")
+        params.append(account)
+    return " AND ".join(clauses), params
+
+
+def _row_to_transaction(row: sqlite3.Row) -> dict:
+    transaction = dict(row)
+    transaction["date"] = datetime.strptime(transaction["date"], DATE_FORMAT)
+    return transaction
+
+
+class SQLiteStore(TransactionStore):
+    """TransactionStore in a local SQLite file, for single-node deployments.
+
+    Every query runs on one dedicated thread that owns the connection, so
+    the event loop never blocks on disk and no locking is needed. Balances
+    are kept in a summary table updated in the same transaction as each
+    insert, like the Mongo balance documents.
+
+    Args:
+        path: The database file. Created, with its indexes, if missing.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            # WAL lets readers in other processes (e.g. backups) run alongside writes.
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _call(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: function(self._connect(), *args))
+
+    async def ping(self) -> bool:
+        try:
+            await self._call(lambda connection: connection.execute("SELECT 1").fetchone())
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"SQLite ping failed: {e}")
+            return False
+
+    async def ensure_indexes(self) -> None:
+        # The schema, including its indexes, is created when the connection opens.
+        await self._call(lambda connection: None)
+
+    @staticmethod
+    def _totals(connection: sqlite3.Connection, user_id: int, start=None, end=None, account=None) -> dict:
+        where, params = _where(user_id, start, end, account)
+        row = connection.execute(
+            f"SELECT COALESCE(SUM(income), 0) AS total_income, COALESCE(SUM(expenditure), 0) AS total_expenditure, "
+            f"COUNT(*) AS transaction_count FROM finances WHERE {where}",
+            params,
+        ).fetchone()
+        return dict(row) if row else dict(EMPTY_TOTALS)
+
+    @classmethod
+    def _rebuild(cls, connection: sqlite3.Connection, user_id: int) -> float:
+        totals = cls._totals(connection, user_id)
+        connection.execute(
+            "INSERT INTO balances (user_id, total_income, total_expenditure, transaction_count, version) "
+            "VALUES (:user_id, :total_income, :total_expenditure, :transaction_count, 1) "
+            "ON CONFLICT (user_id) DO UPDATE SET total_income = excluded.total_income, "
+            "total_expenditure = excluded.total_expenditure, transaction_count = excluded.transaction_count, "
+            "version = version + 1",
+            {"user_id": user_id, **totals},
+        )
+        return balance_of(totals)
+
+    @classmethod
+    def _insert(cls, connection: sqlite3.Connection, transactions: list) -> float:
+        user_id = transactions[0]["user_id"]
+        with connection:
+            connection.executemany(
+                "INSERT INTO finances (user_id, date, account, income, expenditure, remarks) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        transaction["user_id"],
+                        transaction["date"].strftime(DATE_FORMAT),
+                        transaction.get("account"),
+                        transaction.get("income", 0),
+                        transaction.get("expenditure", 0),
+                        transaction.get("remarks"),
+                    )
+                    for transaction in transactions
+                ],
+            )
+            updated = connection.execute(
+                "UPDATE balances SET total_income = total_income + ?, total_expenditure = total_expenditure + ?, "
+                "transaction_count = transaction_count + ?, version = version + 1 WHERE user_id = ?",
+                (
+                    sum(transaction.get("income", 0) for transaction in transactions),
+                    sum(transaction.get("expenditure", 0) for transaction in transactions),
+                    len(transactions),
+                    user_id,
+                ),
+            )
+            if updated.rowcount == 0:
+                return cls._rebuild(connection, user_id)
+            row = connection.execute("SELECT * FROM balances WHERE user_id = ?", (user_id,)).fetchone()
+            return balance_of(dict(row))
+
+    async def insert_transaction(self, finance_data: dict) -> float:
+        return await self._call(self._insert, [finance_data])
+
+    async def insert_transactions(self, transactions: list) -> float:
+        return await self._call(self._insert, transactions)
+
+    async def get_balance(self, user_id: int) -> float:
+        def read(connection: sqlite3.Connection) -> float:
+            row = connection.execute("SELECT * FROM balances WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                with connection:
+                    return self._rebuild(connection, user_id)
+            return balance_of(dict(row))
+
+        return await self._call(read)
+
+    async def rebuild_balance(self, user_id: int) -> float:
+        def rebuild(connection: sqlite3.Connection) -> float:
+            with connection:
+                return self._rebuild(connection, user_id)
+
+        balance = await self._call(rebuild)
+        logging.info("Rebuilt balance for user %s: %s", user_id, balance)
+        return balance
+
+    async def get_data_version(self, user_id: int) -> int:
+        def read(connection: sqlite3.Connection) -> int:
+            row = connection.execute("SELECT version FROM balances WHERE user_id = ?", (user_id,)).fetchone()
+            return row["version"] if row else 0
+
+        return await self._call(read)
+
+    async def find_transactions(self, user_id: int, start: datetime = None, end: datetime = None):
+        where, params = _where(user_id, start, end)
+        # Page by (date, id) instead of holding a cursor open, so inserts in between cannot disturb it.
+        after = ("", 0)
+        while True:
+            rows = await self._call(lambda connection: connection.execute(
+                f"SELECT id, date, account, income, expenditure, remarks FROM finances "
+                f"WHERE {where} AND (date, id) > (?, ?) ORDER BY date, id LIMIT ?",
+                params + [*after, SQLITE_FETCH_SIZE],
+            ).fetchall())
+            if not rows:
+                return
+            after = (rows[-1]["date"], rows[-1]["id"])
+            for row in rows:
+                transaction = _row_to_transaction(row)
+                del transaction["id"]
+                yield transaction
+
+    async def totals(self, user_id: int, start: datetime = None, end: datetime = None, account: str = None) -> dict:
+        return await self._call(self._totals, user_id, start, end, account)
+
+    async def spend_per_account(self, user_id: int, start: datetime = None, end: datetime = None, limit: int = 5) -> list:
+        where, params = _where(user_id, start, end)
+        rows = await self._call(lambda connection: connection.execute(
+            f"SELECT account, SUM(expenditure) AS total_expenditure FROM finances "
+            f"WHERE {where} AND expenditure > 0 GROUP BY account ORDER BY total_expenditure DESC LIMIT ?",
+            params + [limit],
+        ).fetchall())
+        return [dict(row) for row in rows]
+
+    async def is_user_allowed(self, user_id: int) -> bool:
+        row = await self._call(lambda connection: connection.execute(
+            "SELECT 1 FROM allowed_users WHERE user_id = ?", (user_id,)
+        ).fetchone())
+        return row is not None
+
+    async def set_user_allowed(self, user_id: int, allowed: bool) -> None:
+        def write(connection: sqlite3.Connection) -> None:
+            with connection:
+                if allowed:
+                    connection.execute("INSERT OR IGNORE INTO allowed_users (user_id) VALUES (?)", (user_id,))
+                else:
+                    connection.execute("DELETE FROM allowed_users WHERE user_id = ?", (user_id,))
+
+        await self._call(write)
@@ -0,0 +1,242 @@
+from datetime import date, datetime
+import csv
+import io
+import itertools
+import os
+import re
+
+from fast_parser import guess_account
+from models import ACCOUNTS
+from storage import to_datetime
+
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "100000"))
+# Rows read to pick the file's date format before any row is imported.
+IMPORT_DATE_SAMPLE_ROWS = int(os.getenv("IMPORT_DATE_SAMPLE_ROWS", "500"))
+
+# Header names used by common bank exports, lowercased, for each field we read.
+COLUMN_ALIASES = {
+    "date": ["date", "transaction date", "txn date", "value date", "posting date", "tran date"],
+    "description": ["description", "narration", "details", "remarks", "particulars", "memo", "transaction details"],
+    "amount": ["amount", "transaction amount", "amt"],
+    "debit": ["debit", "debit amount", "withdrawal", "withdrawal amt", "withdrawal amount", "withdrawals", "dr"],
+    "credit": ["credit", "credit amount", "deposit", "deposit amt", "deposit amount", "deposits", "cr"],
+    "type": ["type", "dr/cr", "cr/dr", "transaction type"],
+    "account": ["account", "category"],
+}
+# Day-first formats come before month-first ones, as most of our users' banks export them.
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%m-%y',
+                '%d %b %Y', '%d-%b-%Y', '%d %B %Y', '%Y/%m/%d', '%m/%d/%Y']
+AMOUNT_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+ACCOUNTS_BY_NAME = {account.lower(): account for account in ACCOUNTS}
+
+
+class ImportResult:
+    """The transactions parsed from a file and how many rows could not be read."""
+
+    def __init__(self):
+        self.transactions = []
+        self.skipped = 0
+
+
+def _normalise_header(header) -> str:
+    return re.sub(r"[\s_.]+", " ", str(header or "")).strip().lower()
+
+
+def map_columns(header: list) -> dict:
+    """Map each known field to its column index in header.
+
+    Raises:
+        ValueError: If there is no date column, or no amount, debit or credit column.
+    """
+    names = [_normalise_header(name) for name in header]
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                mapping[field] = names.index(alias)
+                break
+    if "date" not in mapping:
+        raise ValueError("The file has no date column.")
+    if not {"amount", "debit", "credit"} & mapping.keys():
+        raise ValueError("The file has no amount, debit or credit column.")
+    return mapping
+
+
+def parse_date(value, formats: list = DATE_FORMATS):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    text = str(value or "").strip()
+    for date_format in formats:
+        try:
+            return datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value):
+    """Parse "1,234.50", "(200)", "Rs. 300" or a number. Returns None for empty cells."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or "").strip()
+    if not text:
+        return None
+    negative = text.startswith("(") and text.endswith(")") or text.startswith("-")
+    # The first number, so the dot in a prefix like "Rs." is not read as a decimal point.
+    match = AMOUNT_PATTERN.search(text)
+    if match is None:
+        return None
+    amount = float(match[0].replace(",", ""))
+    return -amount if negative else amount
+
+
+def _cell(row: list, mapping: dict, field: str):
+    index = mapping.get(field)
+    return row[index] if index is not None and index < len(row) else None
+
+
+def detect_date_format(rows: list, mapping: dict) -> list:
+    """Pick one date format for the whole file from a sample of its rows.
+
+    Guessing per cell would read 03/04/2025 day-first in a month-first file
+    while 25/04/2025 in the same file only parses month-first. Instead the
+    first of DATE_FORMATS that parses every sampled date (or, failing that,
+    the most of them) is used for every row. Cells no format parses, such as
+    a closing balance line, are ignored.
+
+    Returns:
+        A list with the chosen format, or DATE_FORMATS if no text dates were sampled.
+    """
+    texts = [str(value).strip() for value in (_cell(row, mapping, "date") for row in rows)
+             if value not in (None, "") and not isinstance(value, (date, datetime))]
+    parsed = {date_format: sum(parse_date(text, [date_format]) is not None for text in texts)
+              for date_format in DATE_FORMATS}
+    dates = sum(parse_date(text) is not None for text in texts)
+    if not dates:
+        return DATE_FORMATS
+    # max keeps the first of equally good formats, so day-first wins when the sample is ambiguous.
+    return [max(DATE_FORMATS, key=lambda date_format: parsed[date_format])]
+
+
+def row_to_transaction(row: list, mapping: dict, user_id: int, date_formats: list = DATE_FORMATS):
+    """Turn one spreadsheet row into a transaction document, or None if it is not one."""
+    def cell(field):
+        return _cell(row, mapping, field)
+
+    day = parse_date(cell("date"), date_formats)
+    if day is None:
+        return None
+    if "amount" in mapping:
+        amount = parse_amount(cell("amount"))
+        if amount is None:
+            return None
+        kind = str(cell("type") or "").strip().lower()
+        if kind in ("cr", "credit", "deposit", "income"):
+            income, expenditure = abs(amount), 0
+        elif kind in ("dr", "debit", "withdrawal", "expense"):
+            income, expenditure = 0, abs(amount)
+        else:
+            income, expenditure = (amount, 0) if amount > 0 else (0, -amount)
+    else:
+        income = abs(parse_amount(cell("credit")) or 0)
+        expenditure = abs(parse_amount(cell("debit")) or 0)
+    if not income and not expenditure:
+        return None
+
+    description = str(cell("description") or "").strip()
+    account = ACCOUNTS_BY_NAME.get(str(cell("account") or "").strip().lower())
+    account = account or guess_account(description) or "Other"
+    return {
+        "date": to_datetime(day),
+        "account": account,
+        "income": income,
+        "expenditure": expenditure,
+        "remarks": description,
+        "user_id": user_id,
+    }
+
+
+def _csv_rows(data: bytes):
+    # utf-8-sig drops the byte order mark Excel puts in front of CSV exports.
+    text = io.StringIO(data.decode("utf-8-sig", errors="replace"))
+    try:
+        dialect = csv.Sniffer().sniff(text.read(4096), delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    text.seek(0)
+    return csv.reader(text, dialect)
+
+
+def _xlsx_rows(data: bytes):
+    # openpyxl is only needed for imports, so it is not imported at startup.
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def _find_header(rows):
+    # Bank exports often start with a few lines of account details before the table.
+    for _ in range(20):
+        row = next(rows, None)
+        if row is None:
+            break
+        try:
+            return map_columns(row)
+        except ValueError:
+            continue
+    raise ValueError("Couldn't find a header row with a date and an amount column.")
+
+
+def parse_statement(data: bytes, filename: str, user_id: int) -> ImportResult:
+    """Parse an uploaded bank export into transaction documents.
+
+    Rows are read one at a time, from CSV or from XLSX in openpyxl's
+    read-only mode. Columns are found by their header names (COLUMN_ALIASES)
+    and one date format is used for the whole file (detect_date_format).
+    Each row is put into the account named in an account or category column,
+    the account whose keywords appear in its description, or Other.
+
+    Args:
+        data: The file contents.
+        filename: The uploaded file's name; its extension picks the format.
+        user_id: The user the transactions belong to.
+
+    Returns:
+        The parsed transactions and the number of rows skipped.
+
+    Raises:
+        ValueError: If the file is too large, not CSV or XLSX, or has no usable header.
+    """
+    if len(data) > IMPORT_MAX_BYTES:
+        raise ValueError(f"The file is larger than {IMPORT_MAX_BYTES // (1024 * 1024)} MB.")
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        rows = iter(_csv_rows(data))
+    elif extension == ".xlsx":
+        rows = _xlsx_rows(data)
+    else:
+        raise ValueError("Only .csv and .xlsx files can be imported.")
+
+    mapping = _find_header(rows)
+    sample = list(itertools.islice(rows, IMPORT_DATE_SAMPLE_ROWS))
+    date_formats = detect_date_format(sample, mapping)
+    result = ImportResult()
+    for row in itertools.chain(sample, rows):
+        if not any(cell not in (None, "") for cell in row):
+            continue
+        transaction = row_to_transaction(row, mapping, user_id, date_formats)
+        if transaction is None:
+            result.skipped += 1
+            continue
+        result.transactions.append(transaction)
+        if len(result.transactions) > IMPORT_MAX_ROWS:
+            raise ValueError(f"The file has more than {IMPORT_MAX_ROWS} transactions.")
+    return result
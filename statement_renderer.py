@@ -0,0 +1,175 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import asyncio
+import io
+import logging
+import os
+
+from cache import LRUCache
+from storage import format_date, get_store, to_datetime
+
+STATEMENT_WORKERS = int(os.getenv("STATEMENT_WORKERS", "2"))
+STATEMENT_CACHE_SIZE = int(os.getenv("STATEMENT_CACHE_SIZE", "64"))
+STATEMENT_CACHE_TTL_SECONDS = float(os.getenv("STATEMENT_CACHE_TTL_SECONDS", "3600"))
+STATEMENT_BATCH_SIZE = int(os.getenv("STATEMENT_BATCH_SIZE", "500"))
+
+COLUMNS = [(50, "Date"), (130, "Account"), (220, "Income"), (300, "Expenditure"), (390, "Remarks")]
+REMARKS_WIDTH = 170
+ROW_HEIGHT = 20
+TOP = 700
+BOTTOM = 60
+
+_executor = ThreadPoolExecutor(max_workers=STATEMENT_WORKERS, thread_name_prefix="statement")
+
+# Rendered PDFs keyed by (user_id, start, end, data version).
+statement_cache = LRUCache(maxsize=STATEMENT_CACHE_SIZE, ttl=STATEMENT_CACHE_TTL_SECONDS)
+
+
+def month_period(day: date) -> tuple:
+    """Return the first and last day of the month containing day."""
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def parse_period(args: list) -> tuple:
+    """Parse /getstatement arguments into an inclusive (start, end) date range.
+
+    Accepts no arguments (the current month), a month ("2025-01") or a start
+    and end date ("2025-01-01 2025-01-15").
+
+    Raises:
+        ValueError: If the arguments are not in one of those formats.
+    """
+    if not args:
+        return month_period(date.today())
+    if len(args) == 1:
+        return month_period(datetime.strptime(args[0], '%Y-%m').date())
+    if len(args) == 2:
+        start = datetime.strptime(args[0], '%Y-%m-%d').date()
+        end = datetime.strptime(args[1], '%Y-%m-%d').date()
+        if end < start:
+            raise ValueError("The end date must not be before the start date.")
+        return start, end
+    raise ValueError("Use /getstatement, /getstatement YYYY-MM or /getstatement YYYY-MM-DD YYYY-MM-DD.")
+
+
+def format_period(start: date, end: date) -> str:
+    if (start, end) == month_period(start):
+        return start.strftime('%B %Y')
+    return f"{start.isoformat()} to {end.isoformat()}"
+
+
+class StatementRenderer:
+    """Draws statement rows onto a PDF, starting a new page whenever one fills up."""
+
+    def __init__(self, title: str):
+        # reportlab is only needed once a statement is requested, so it is not imported at startup.
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+
+        self.title = title
+        self.row_count = 0
+        self.total_income = 0
+        self.total_expenditure = 0
+        self._buffer = io.BytesIO()
+        self._canvas = canvas.Canvas(self._buffer, pagesize=letter)
+        self._page = 0
+        self._start_page()
+
+    def _start_page(self) -> None:
+        c = self._canvas
+        self._page += 1
+        if self._page > 1:
+            c.showPage()
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, 750, self.title)
+        c.setFont("Helvetica", 10)
+        c.drawString(50, 730, f"Generated: {datetime.now().strftime('%Y-%m-%d')}")
+        c.drawRightString(560, 730, f"Page {self._page}")
+        c.setFont("Helvetica-Bold", 11)
+        for x, heading in COLUMNS:
+            c.drawString(x, TOP, heading)
+        c.setFont("Helvetica", 10)
+        self._y = TOP - ROW_HEIGHT
+
+    def _next_line(self) -> None:
+        self._y -= ROW_HEIGHT
+        if self._y < BOTTOM:
+            self._start_page()
+
+    def _fit(self, text: str, width: float) -> str:
+        while text and self._canvas.stringWidth(text, "Helvetica", 10) > width:
+            text = text[:-2] + "…" if len(text) > 1 else ""
+        return text
+
+    def add_rows(self, rows) -> None:
+        c = self._canvas
+        for row in rows:
+            income = row.get('income', 0) or 0
+            expenditure = row.get('expenditure', 0) or 0
+            c.drawString(COLUMNS[0][0], self._y, format_date(row.get('date')))
+            c.drawString(COLUMNS[1][0], self._y, str(row.get('account', '')))
+            c.drawString(COLUMNS[2][0], self._y, str(income))
+            c.drawString(COLUMNS[3][0], self._y, str(expenditure))
+            c.drawString(COLUMNS[4][0], self._y, self._fit(str(row.get('remarks', '')), REMARKS_WIDTH))
+            self.row_count += 1
+            self.total_income += income
+            self.total_expenditure += expenditure
+            self._next_line()
+
+    def finish(self) -> bytes:
+        c = self._canvas
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(COLUMNS[1][0], self._y, "Total")
+        c.drawString(COLUMNS[2][0], self._y, str(self.total_income))
+        c.drawString(COLUMNS[3][0], self._y, str(self.total_expenditure))
+        self._next_line()
+        c.drawString(COLUMNS[1][0], self._y, f"Net: {self.total_income - self.total_expenditure}")
+        c.save()
+        return self._buffer.getvalue()
+
+
+async def _render(user_id: int, start: date, end: date, title: str):
+    # Rows stream from the store in batches; each batch is drawn in the worker pool.
+    loop = asyncio.get_running_loop()
+    rows = get_store().find_transactions(user_id, to_datetime(start), to_datetime(end + timedelta(days=1)))
+    renderer = await loop.run_in_executor(_executor, StatementRenderer, title)
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= STATEMENT_BATCH_SIZE:
+            await loop.run_in_executor(_executor, renderer.add_rows, batch)
+            batch = []
+    if batch:
+        await loop.run_in_executor(_executor, renderer.add_rows, batch)
+    if renderer.row_count == 0:
+        return None
+    return await loop.run_in_executor(_executor, renderer.finish)
+
+
+async def render_statement(user_id: int, start: date, end: date):
+    """Render the user's statement for [start, end] as a PDF, drawing in a worker thread.
+
+    Results are cached per data version, so repeated requests are served
+    without touching the store again until the user adds a transaction.
+
+    Args:
+        user_id: The Telegram user whose transactions are listed.
+        start: The first day of the statement.
+        end: The last day of the statement, inclusive.
+
+    Returns:
+        The PDF bytes, or None if there are no transactions in the period.
+    """
+    key = (user_id, start, end, await get_store().get_data_version(user_id))
+    pdf = statement_cache.get(key)
+    if pdf is not None:
+        return pdf or None
+
+    title = f"Statement for {format_period(start, end)}"
+    pdf = await _render(user_id, start, end, title)
+    # Empty periods are cached as b"" so they are not re-queried either.
+    statement_cache.set(key, pdf or b"")
+    logging.info("Rendered statement for user %s (%s to %s)", user_id, start, end)
+    return pdf
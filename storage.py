@@ -0,0 +1,123 @@
+from datetime import date, datetime
+import os
+
+# mongo, sqlite or sheets.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+EMPTY_TOTALS = {"total_income": 0, "total_expenditure": 0, "transaction_count": 0}
+
+
+def to_datetime(value: date) -> datetime:
+    """Convert a date to the midnight datetime transactions are stored with."""
+    if isinstance(value, datetime):
+        return datetime.combine(value.date(), datetime.min.time())
+    return datetime.combine(value, datetime.min.time())
+
+
+def format_date(value) -> str:
+    """Format a stored transaction date. Mongo dates not migrated yet are still strings."""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+def balance_of(totals: dict) -> float:
+    if not totals:
+        return 0
+    return totals.get("total_income", 0) - totals.get("total_expenditure", 0)
+
+
+class TransactionStore:
+    """Where a bot keeps its users' transactions.
+
+    A transaction is a dict with "user_id", "date" (a midnight datetime),
+    "account", "income", "expenditure" and "remarks". Date ranges are half
+    open, [start, end), and either bound may be None.
+    """
+
+    async def ping(self) -> bool:
+        """Return True if the backend is reachable."""
+        return True
+
+    async def ensure_indexes(self) -> None:
+        """Create whatever the backend needs for fast per-user queries. Safe to call on every startup."""
+
+    async def insert_transaction(self, finance_data: dict) -> float:
+        """Store a transaction and return the user's balance after it."""
+        raise NotImplementedError
+
+    async def insert_transactions(self, transactions: list) -> float:
+        """Store many transactions of one user and return their balance after them.
+
+        Backends override this to write in batches and update the balance once.
+        """
+        balance = 0
+        for finance_data in transactions:
+            balance = await self.insert_transaction(finance_data)
+        return balance
+
+    async def get_balance(self, user_id: int) -> float:
+        """Return the user's current balance."""
+        raise NotImplementedError
+
+    async def rebuild_balance(self, user_id: int) -> float:
+        """Recompute any stored balance from the raw transactions and return it."""
+        return await self.get_balance(user_id)
+
+    async def get_data_version(self, user_id: int) -> int:
+        """Return a number that changes whenever the user's transactions change."""
+        raise NotImplementedError
+
+    def find_transactions(self, user_id: int, start: datetime = None, end: datetime = None):
+        """Return an async iterator over the user's transactions in [start, end), oldest first."""
+        raise NotImplementedError
+
+    async def totals(self, user_id: int, start: datetime = None, end: datetime = None, account: str = None) -> dict:
+        """Return total_income, total_expenditure and transaction_count for [start, end)."""
+        raise NotImplementedError
+
+    async def spend_per_account(self, user_id: int, start: datetime = None, end: datetime = None, limit: int = 5) -> list:
+        """Return the accounts with the highest spending in [start, end), highest first.
+
+        Each entry is a dict with "account" and "total_expenditure".
+        """
+        raise NotImplementedError
+
+    async def is_user_allowed(self, user_id: int) -> bool:
+        """Return True if the user is on the allowlist kept in the backend."""
+        return False
+
+    async def set_user_allowed(self, user_id: int, allowed: bool) -> None:
+        """Add the user to the allowlist, or remove them from it."""
+        raise NotImplementedError("This storage backend has no user allowlist.")
+
+
+_store = None
+
+
+def get_store() -> TransactionStore:
+    """Return the store selected by STORAGE_BACKEND, creating it on first use.
+
+    Backends are imported only when selected, so e.g. a SQLite deployment
+    does not need pymongo or gspread installed.
+    """
+    global _store
+    if _store is None:
+        if STORAGE_BACKEND == "mongo":
+            from finances_store import MongoStore
+            _store = MongoStore()
+        elif STORAGE_BACKEND == "sqlite":
+            from sqlite_store import SQLiteStore
+            _store = SQLiteStore()
+        elif STORAGE_BACKEND == "sheets":
+            from sheets_store import SheetsStore
+            _store = SheetsStore.from_env()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}. Use mongo, sqlite or sheets.")
+    return _store
+
+
+def set_store(store: TransactionStore) -> None:
+    """Use store instead of the STORAGE_BACKEND one, e.g. in benchmarks."""
+    global _store
+    _store = store
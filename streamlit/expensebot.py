@@ -1,14 +1,18 @@
 import streamlit as st
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
 import os
 import google.generativeai as genai
 import pandas as pd
 import json
-import os
+import sys
 import dotenv
 
+# Shared modules live in the repository root.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sheets_store import SheetsStore
+from storage import to_datetime
+
 dotenv.load_dotenv()
 
 # --- Gemini API Setup ---
@@ -18,22 +22,50 @@ if not GEMINI_API_KEY:
     st.error("Please set the GOOGLE_API_KEY environment variable.")
     st.stop()
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+# Streamlit re-runs this script on every interaction. Clients are shared resources,
+# created once per server process, and data is cached across reruns and sessions.
+DASHBOARD_CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "60"))
+# Separate from the bot's SHEET_SPILL_PATH, so both can run from the same directory.
+DASHBOARD_SPILL_PATH = os.getenv("DASHBOARD_SPILL_PATH", "sheet_pending_dashboard.jsonl")
+
+
+@st.cache_resource
+def get_model() -> genai.GenerativeModel:
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel("gemini-1.5-flash")
+
+
+model = get_model()
 
 # --- Google Sheets Setup ---
-CREDENTIALS_FILE = 'sheets_key.json'
+@st.cache_resource
+def get_sheets_store() -> SheetsStore:
+    # Holds the gspread client, the sheet mirror and the write buffer.
+    return SheetsStore.from_env(spill_path=DASHBOARD_SPILL_PATH)
 
-if not os.path.exists(CREDENTIALS_FILE):
-    st.error("Credential file not found. Please provide a valid JSON keyfile.")
+
+try:
+    STORE = get_sheets_store()
+except (FileNotFoundError, RuntimeError) as e:
+    st.error(str(e))
     st.stop()
 
-SCOPE = ['https://spreadsheets.google.com/feeds', 
-         'https://www.googleapis.com/auth/drive', 
-         'https://www.googleapis.com/auth/spreadsheets']
-CREDS = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SCOPE)
-CLIENT = gspread.authorize(CREDS)
-SHEET = CLIENT.open('Expense Sheet').sheet1
+# The sheet holds a single user's transactions, so every read and write uses the same id.
+USER_ID = 0
+
+
+async def _transactions() -> pd.DataFrame:
+    rows = [row async for row in STORE.find_transactions(USER_ID)]
+    return pd.DataFrame(rows, columns=["date", "account", "income", "expenditure", "remarks"])
+
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL_SECONDS, show_spinner=False)
+def load_transactions() -> pd.DataFrame:
+    """All transactions, typed and sorted by date. Cleared whenever the app adds one."""
+    df = asyncio.run(_transactions())
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    return df
+
 
 # --- Streamlit UI ---
 st.title('Expense and Income Tracker Bot (Gemini Powered)')
@@ -78,22 +110,22 @@ if st.button('Process'):
             if amount is None:
                 raise ValueError("Could not extract amount from the input")
 
-            date_str = datetime.now().strftime('%Y-%m-%d')
             income = float(amount) if transaction_type == "Income" else 0
             expenditure = float(amount) if transaction_type == "Expense" else 0
             remarks = user_input
 
-            row = [date_str, account, income, expenditure, remarks]
-            SHEET.append_row(row)
+            finance_data = {
+                "date": to_datetime(datetime.now()),
+                "account": account,
+                "income": income,
+                "expenditure": expenditure,
+                "remarks": remarks,
+                "user_id": USER_ID,
+            }
+            balance = asyncio.run(STORE.insert_transaction(finance_data))
+            load_transactions.clear()
             st.success('Entry added successfully!')
 
-            # Calculate available balance
-            all_data = SHEET.get_all_values()
-            df = pd.DataFrame(all_data[1:], columns=all_data[0])
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            df['Income'] = pd.to_numeric(df['Income'], errors='coerce').fillna(0)
-            df['Expenditure'] = pd.to_numeric(df['Expenditure'], errors='coerce').fillna(0)
-            balance = df['Income'].sum() - df['Expenditure'].sum()
             st.write(f"**Current Available Balance: {balance}**")
 
         except json.JSONDecodeError:
@@ -113,23 +145,16 @@ get_balance = st.checkbox("Get Balance")
 if st.button("Get Data"):
     if get_statement or get_balance:
         try:
-            all_data = SHEET.get_all_values()
-            df = pd.DataFrame(all_data[1:], columns=all_data[0])
-
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            df['Income'] = pd.to_numeric(df['Income'], errors='coerce').fillna(0)
-            df['Expenditure'] = pd.to_numeric(df['Expenditure'], errors='coerce').fillna(0)
-            
-            statement_date = datetime.combine(statement_date, datetime.min.time())
-            
-            filtered_df = df[df['Date'] <= statement_date]
+            statement_date = to_datetime(statement_date)
+            df = load_transactions()
+            filtered_df = df[df['date'] < statement_date + timedelta(days=1)]
 
             if get_statement:
                 st.write(f"**Statement as of {statement_date.strftime('%Y-%m-%d')}:**")
                 st.dataframe(filtered_df)
 
             if get_balance:
-                balance = filtered_df['Income'].sum() - filtered_df['Expenditure'].sum()
+                balance = filtered_df['income'].sum() - filtered_df['expenditure'].sum()
                 st.write(f"**Balance as of {statement_date.strftime('%Y-%m-%d')}: {balance}**")
 
         except Exception as e:
@@ -140,17 +165,11 @@ st.subheader("Get Monthly Statement")
 month_input = st.date_input("Select month for statement", datetime.today())
 if st.button("Get Monthly Statement"):
     try:
-        all_data = SHEET.get_all_values()
-        df = pd.DataFrame(all_data[1:], columns=all_data[0])
-
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df['Income'] = pd.to_numeric(df['Income'], errors='coerce').fillna(0)
-        df['Expenditure'] = pd.to_numeric(df['Expenditure'], errors='coerce').fillna(0)
-
         start_of_month = datetime(month_input.year, month_input.month, 1)
-        end_of_month = (start_of_month + pd.offsets.MonthEnd(1)).to_pydatetime()
+        start_of_next_month = (start_of_month + pd.offsets.MonthBegin(1)).to_pydatetime()
 
-        filtered_df = df[(df['Date'] >= start_of_month) & (df['Date'] <= end_of_month)]
+        df = load_transactions()
+        filtered_df = df[(df['date'] >= start_of_month) & (df['date'] < start_of_next_month)]
 
         st.write(f"**Statement for {start_of_month.strftime('%B %Y')}:**")
         st.dataframe(filtered_df)
@@ -1,151 +1,112 @@
-import google.generativeai as genai
-import os
+from llm_client import generate_text
 import logging
 import json
-import generate_response
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("Please set the GEMINI_API_KEY environment variable.")
+# Sent once per process as the model's system instruction; only the results and query change per call.
+SYSTEM_INSTRUCTION = """\
+You are a friendly financial assistant for an expense tracking bot. The calculations for the user's query have already been done from their transaction data. Your job is to answer the query clearly and concisely using only the computed results in the message. Never invent numbers that are not in the results.
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+**Instructions:**
 
+1.  **Reading the Results:**
+    *   "balance" is income minus expenditure. "total_income" and "total_expenditure" are sums. "transaction_count" is the number of matching transactions.
+    *   "top_accounts" lists accounts by total expenditure, highest first. The first one is where the user spent the most. If two accounts tie, mention either one.
+    *   "start_date" and "end_date" give the period the results cover, both inclusive. Without them the results cover all transactions.
+    *   If "transaction_count" is 0 or "top_accounts" is empty, state that no transactions were found for the date, account or period asked about.
 
-async def summarise_balance_data(text: str, json_data: dict) -> str:
-    """Analyzes JSON data using Gemini LLM based on a user's natural language query.
+2.  **Response Formatting:**
+    *   All numerical responses (balance, expenditure) should be formatted as plain numbers without currency symbols.
+    *   If the balance is less than 20000, add the message: "Consider saving more."
+    *   If the balance is greater than or equal to 20000, add the message: "Great job on saving!"
+    *   If the balance is 0, add the message: "Track your expenses regularly. It seems you haven't added any transactions yet."
+    *   If the balance is negative, add the message: "Be careful with your expenses."
+    *   Respond in the same language as the user query.
 
-    Args:
-        json_data: A JSON string or a Python dictionary representing the data.
-        user_query: The user's query in natural language.
-
-    Returns:
-        A string containing the response to the user's query, or an error message.
-    """
-    
-    try:
-        if isinstance(json_data, str):
-            data = json.loads(json_data)
-        elif isinstance(json_data, dict):
-            data = json_data
-        else:
-            return "Error: Invalid JSON data provided."
-        
-        prompt = f"""
-        You are a highly accurate financial data analyst designed to process transaction data and answer user queries precisely. Your primary goal is to perform calculations accurately and provide clear, concise responses. You have access to transaction data in JSON format, containing details like date, account, income, expenditure, remarks, and user_id.
-
-        Here is the JSON data:
-        {data}
-
-        The user's query is:
-        {text}
-
-        **Instructions:**
-
-        1.  **Data Handling:**
-            *   The provided JSON data is a list of transaction objects. Each object contains the keys: "date" (YYYY-MM-DD), "account" (string), "income" (numerical, can be 0), "expenditure" (numerical, can be 0), "remarks" (string), and "user_id" (numerical).
-            *   All calculations should be performed using the numerical values of "income" and "expenditure". Treat missing or non-numerical values as 0.
-
-        2.  **Balance Calculation:**
-            *   If the user asks for the "balance," "current balance," or similar, calculate the current balance.
-            *   To calculate the balance:
-                *   Initialize a `balance` variable to 0.
-                *   Iterate through each transaction in the provided JSON data.
-                *   For each transaction, add the "income" to the `balance` and subtract the "expenditure" from the `balance`.
-                *   Return the final `balance`.
-            *   If there are no transactions (empty JSON data), the balance is 0.
-
-        3.  **Spending History Analysis (Date-Specific):**
-            *   If the user asks about spending on a specific date (e.g., "How much did I spend on 2024-01-25?"), filter the transactions for that date.
-            *   Calculate the total expenditure for that date by summing the "expenditure" values of the filtered transactions.
-            *   Return the total expenditure for that date.
-            *   If no transactions are found for the given date, state "No transactions found for [date]."
-
-        4.  **Spending Analysis (Category/Account):**
-            *   If the user asks about spending in a specific account/category (e.g., "How much did I spend on Groceries?"), filter transactions by that account.
-            *   Calculate the total expenditure for that account by summing the "expenditure" values of the filtered transactions.
-            *   Return the total expenditure for that account.
-            *   If no transactions are found for the given account, state "No transactions found for [account]."
-
-        5.  **Spending Analysis (Most Spent Category):**
-            *   If the user asks "Where did I spend the most?" or similar, analyze spending across different accounts.
-            *   Create a dictionary to store the total expenditure for each account.
-            *   Iterate through all transactions and accumulate the "expenditure" for each account.
-            *   Find the account with the highest total expenditure.
-            *   Return the account with the highest expenditure. If there is a tie between two accounts, return any one of them.
-            *   If there are no transactions, state "No transactions to analyze."
-
-        6.  **Response Formatting:**
-            *   All numerical responses (balance, expenditure) should be formatted as plain numbers without currency symbols.
-            *   If the balance is less than 20000, add the message: "Consider saving more."
-            *   If the balance is greater than or equal to 20000, add the message: "Great job on saving!"
-            *   If the balance is 0, add the message: "Track your expenses regularly. It seems you haven't added any transactions yet."
-            *   If the balance is negative, add the message: "Be careful with your expenses."
-            *   Respond in the same language as the user query.
-
-        7. **Handling Greetings and General Inquiries:**
-            * If the user is just greeting, respond with a polite greeting saying you are the expense tracking bot.
-            * If the user asks general questions unrelated to finances (e.g., "Who created you?"), provide a polite and brief response and add "How can I assist you with your finances today?"
-
-        **Examples:**
+3. **Handling Greetings and General Inquiries:**
+    * If the results are empty and the user is just greeting, respond with a polite greeting saying you are the expense tracking bot.
+    * If the user asks general questions unrelated to finances (e.g., "Who created you?"), provide a polite and brief response and add "How can I assist you with your finances today?"
 
-        **Example 1:**
+**Examples:**
 
-        Data: [{{'date': '2025-01-25', 'account': 'Salary', 'income': 10000, 'expenditure': 0, 'remarks': 'Salary'}}, {{'date': '2025-01-25', 'account': 'Rent', 'income': 0, 'expenditure': 5000, 'remarks': 'Monthly Rent'}}, {{'date': '2025-01-26', 'account': 'Groceries', 'income': 0, 'expenditure': 2000, 'remarks': 'Weekly Groceries'}}]
+Results: {"balance": 3000}
+User Query: What is my current balance?
+Output: Your current balance is 3000. You should consider saving more.
 
-        User Query: What is my current balance?
+Results: {"date": "2024-01-25", "total_expenditure": 10000, "transaction_count": 1, "start_date": "2024-01-25"}
+User Query: How much did I spend on 2024-01-25?
+Output: You spent 10000 on 2024-01-25.
 
-        Output: Your current balance is 3000. You should consider saving more. 
+Results: {"top_accounts": [{"account": "Trips", "total_expenditure": 2500}, {"account": "Home", "total_expenditure": 1500}]}
+User Query: Where did I spend the most?
+Output: You spent the most on Trips, a total of 2500.
 
-        **Example 2:**
+Results: {"account": "Home", "total_expenditure": 0, "transaction_count": 0}
+User Query: How much did I spend on Home?
+Output: No transactions found for Home.
 
-        Data: [{{'date': '2024-01-25', 'account': 'Salary', 'income': 25000, 'expenditure': 0, 'remarks': 'Salary'}}, {{'date': '2024-01-25', 'account': 'Rent', 'income': 0, 'expenditure': 10000, 'remarks': 'Monthly Rent'}}]
+Results: {}
+User Query: Hello
+Output: Hello! I am your BudgetBuddy. Your expense tracking bot. How can I assist you with your finances today?
 
-        User Query: How much did I spend on 2024-01-25?
+**Response:**
 
-        Output: You spent 10000 on 2024-01-25. Please be careful with your expenses.
+Follow the instructions precisely and provide a clear and concise response to the user's query based on the computed results.
+"""
 
-        **Example 3:**
 
-        Data: [{{'date': '2024-02-10', 'account': 'Groceries', 'income': 0, 'expenditure': 1500, 'remarks': 'Weekly Groceries'}}, {{'date': '2024-02-15', 'account': 'Entertainment', 'income': 0, 'expenditure': 2500, 'remarks': 'Movie night'}}]
+def plain_summary(results: dict) -> str:
+    """Lists the computed results without Gemini, for when it is unavailable.
 
-        User Query: Where did I spend the most?
-
-        Output: Entertainment
-
-        **Example 4:**
-
-        Data: []
-
-        User Query: What is my current balance?
-
-        Output: 0. Track your expenses regularly. It seems you haven't added any transactions yet.
-
-        **Example 5:**
-
-        Data: [{{'date': '2024-03-01', 'account': 'Salary', 'income': 30000, 'expenditure': 0, 'remarks': 'Salary'}}, {{'date': '2024-03-05', 'account': 'Groceries', 'income': 0, 'expenditure': 5000, 'remarks': 'Weekly Groceries'}}, {{'date': '2024-03-10', 'account': 'Groceries', 'income': 0, 'expenditure': 3000, 'remarks': 'More Groceries'}}]
+    Args:
+        results: The results computed by analytics.run_query.
 
-        User Query: How much did I spend on Groceries?
+    Returns:
+        One "Name: value" line per result, or an empty string if there are none.
+    """
+    lines = []
+    for key, value in results.items():
+        if isinstance(value, list):
+            value = ", ".join(" ".join(str(item) for item in entry.values()) for entry in value) or "none"
+        elif isinstance(value, float):
+            value = f"{value:g}"
+        lines.append(f"{key.replace('_', ' ').capitalize()}: {value}")
+    return "\n".join(lines)
 
-        Output: You spent 8000 on Groceries. While groceries are essential, make sure to track your expenses carefully and consider saving more.
 
-        **Example 6:**
+async def summarise_balance_data(text: str, results: dict) -> str:
+    """Phrases locally computed results as an answer to the user's query using Gemini LLM.
 
-        Data: [{{'date': '2024-04-01', 'account': 'Salary', 'income': 50000, 'expenditure': 0, 'remarks': 'Salary'}}]
-        User Query: Hello
+    Args:
+        text: The user's query in natural language.
+        results: A JSON string or a Python dictionary with the results computed
+            by analytics.run_query. Empty for greetings and unrelated questions.
 
-        Output: Hello! I am your BudgetBuddy. Your expense tracking bot. How can I assist you with your finances today?
+    Returns:
+        A string containing the response to the user's query.
 
-        **Response:**
+    Raises:
+        Exception: If Gemini fails. The caller replies with an error template,
+            and nothing is cached for the query.
+    """
+    
+    try:
+        if isinstance(results, str):
+            data = json.loads(results)
+        elif isinstance(results, dict):
+            data = results
+        else:
+            return "Error: Invalid JSON data provided."
+        
+        prompt = f"""
+        Here are the computed results:
+        {json.dumps(data)}
 
-        Follow the instructions precisely and provide a clear and concise response to the user's query based on the calculations performed.
+        The user's query is:
+        {text}
         """
-        
-        response = model.generate_content(prompt)
-        message = response.text.strip()
+
+        message = await generate_text(prompt, system_instruction=SYSTEM_INSTRUCTION, name="summarise")
         return message
     except Exception as e:
         logging.error(f"An error occurred: {e}")
-        message = f"An error occurred: {e}"
-        message = await generate_response(message)
-        return message
\ No newline at end of file
+        raise
@@ -1,200 +1,224 @@
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext, ContextTypes
-from datetime import datetime
-import google.generativeai as genai
+from datetime import date, datetime
+import asyncio
 import json
 import os
 import dotenv
-import io
 import logging
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
 
 
 #Import LLM helper functions
-from generate_response import generate_response
-from get_intent import get_intent
-from summarise_data import summarise_balance_data
-from get_transaction_data import get_transaction_data
+from replies import balance_template, render_reply
+from extract_message import extract_locally, extract_with_gemini
+from summarise_data import plain_summary, summarise_balance_data
+
+from access import is_admin, is_authorized, set_allowed
+import analytics
+from answer_cache import answer_key, get_answer, set_answer
+import bot_server
+from llm_client import LLMUnavailable, get_model
+from metrics import TimedRequest, stage, traced
+from models import AnalyticsQuery
+from statement_import import parse_statement
+from statement_renderer import format_period, month_period, parse_period, render_statement
+from storage import get_store, to_datetime
+from update_processor import PerUserUpdateProcessor
 
 
 dotenv.load_dotenv()
-# app = Flask(__name__)
-
-# MongoDB setup
-uri = os.getenv("MONGO_URI")
-print("here", uri)
-client = MongoClient(uri, server_api=ServerApi('1'))
-
-db = client['FinancesDB']
-finances_collection = db['finances']
-
-try:
-    client.admin.command('ping')
-    print("Pinged your deployment. You successfully connected to MongoDB!")
-except Exception as e:
-    print(e)
 
 logging.basicConfig(level=logging.INFO)
 
 
-# --- Setup Environment Variables ---
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("Please set the GEMINI_API_KEY environment variable.")
-
-AUTHORIZED_USER_ID = int(os.getenv("AUTHORIZED_USER_ID", "1234567890"))  # Replace with your Telegram user ID
-
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
-
-
 
 # --- Command Handlers ---
+@traced
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Start command handler."""
     print(f"User {update.effective_user} started the bot.")
-    if update.effective_user.id != AUTHORIZED_USER_ID:
-        message = "Unauthorized access!"
-        message = await generate_response(message)
-        await update.message.reply_text(message)
+    language = update.effective_user.language_code
+    if not await is_authorized(update.effective_user.id):
+        await update.message.reply_text(await render_reply("unauthorized", language))
         return
-    message = f"Hey, {update.effective_user.first_name}! How are you doing today? I'm here to help you track your expenses and income. Send me a message with the details of your transaction (e.g., 'Spent 500 on groceries')."
-    message = await generate_response(message)
+    message = await render_reply("start", language, name=update.effective_user.first_name)
     await update.message.reply_text(message)
 
+@traced
 async def get_balance(update: Update, context):
     """Calculate and display the current balance."""
-    if update.effective_user.id != AUTHORIZED_USER_ID:
-        await update.message.reply_text("Unauthorized access!")
+    language = update.effective_user.language_code
+    if not await is_authorized(update.effective_user.id):
+        await update.message.reply_text(await render_reply("unauthorized", language))
         return
 
     try:
-        pipeline = [
-            {
-                "$match": {
-                    "user_id": update.effective_user.id
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "total_income": {"$sum": {"$ifNull": ["$income", 0]}},
-                    "total_expenditure": {"$sum": {"$ifNull": ["$expenditure", 0]}}
-                }
-            }
-        ]
-        result = list(finances_collection.aggregate(pipeline))
-        if result:
-            total_income = result[0]['total_income']
-            total_expenditure = result[0]['total_expenditure']
-            balance = total_income - total_expenditure
-        else:
-            balance = 0
-        
-        message = f"Current Available Balance: {balance}"
-        message = await generate_response(message)
+        with stage("store"):
+            balance = await get_store().get_balance(update.effective_user.id)
+        message = await render_reply(balance_template(balance), language, balance=balance)
         await update.message.reply_text(message)
     except Exception as e:
         logging.error(f"Error calculating balance: {e}")
-        message = "Failed to fetch the balance. Please try again later."
-        message = await generate_response(message)
-        await update.message.reply_text(message)
+        await update.message.reply_text(await render_reply("balance_failed", language))
+
+@traced
+async def get_statement(update: Update, context, start: date = None, end: date = None):
+    """Generate and send a statement as a PDF. Defaults to the current month."""
+    language = update.effective_user.language_code
+    if not await is_authorized(update.effective_user.id):
+        await update.message.reply_text(await render_reply("unauthorized", language))
+        return
 
-async def get_statement(update: Update, context):
-    """Generate and send the current month's statement as a PDF."""
-    if update.effective_user.id != AUTHORIZED_USER_ID:
-        message = "Unauthorized access!"
-        message = await generate_response(message)
-        await update.message.reply_text(message)
+    try:
+        if start is None:
+            start, end = parse_period(context.args)
+        end = end or month_period(start)[1]
+    except ValueError as ve:
+        await update.message.reply_text(await render_reply("error", language, error=ve))
         return
 
     try:
-        # Filter for the current month's transactions in MongoDB
-        current_month = datetime.now().strftime('%Y-%m')
-        transactions = list(finances_collection.find({
-            "date": {"$regex": f"^{current_month}"},
-            "user_id": update.effective_user.id
-        }))
-
-        if transactions:
-            # Create a PDF buffer
-            buffer = io.BytesIO()
-            c = canvas.Canvas(buffer, pagesize=letter)
-
-            # Set title
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(200, 750, "Current Month Statement")
-
-            # Add a space
-            c.setFont("Helvetica", 12)
-            c.drawString(50, 720, f"Date: {datetime.now().strftime('%Y-%m-%d')}")
-
-            # Draw table header
-            y = 700
-            c.drawString(50, y, "Date")
-            c.drawString(150, y, "Account")
-            c.drawString(250, y, "Income")
-            c.drawString(350, y, "Expenditure")
-            c.drawString(450, y, "Remarks")
-
-            # Draw table content
-            y -= 20
-            for transaction in transactions:
-                c.drawString(50, y, transaction['date'])
-                c.drawString(150, y, transaction['account'])
-                c.drawString(250, y, str(transaction['income']))
-                c.drawString(350, y, str(transaction['expenditure']))
-                c.drawString(450, y, transaction['remarks'])
-                y -= 20
-
-            # Save PDF to buffer
-            c.save()
-
-            # Rewind the buffer to the beginning
-            buffer.seek(0)
-            
-            caption = "Here is your current month's statement."
-            message = await generate_response(caption)
+        period = format_period(start, end)
+        with stage("statement"):
+            pdf = await render_statement(update.effective_user.id, start, end)
+        if pdf:
+            message = await render_reply("statement_caption", language, period=period)
 
             # Send the PDF as a document
             await update.message.reply_document(
-                document=buffer,
-                filename="statement.pdf",
+                document=pdf,
+                filename=f"statement_{start.isoformat()}_{end.isoformat()}.pdf",
                 caption=message
             )
         else:
-            message = "No transactions found for the current month."
-            message = await generate_response(message)
-            await update.message.reply_text(message)
+            await update.message.reply_text(await render_reply("statement_empty", language, period=period))
     except Exception as e:
         logging.error(f"Error generating statement: {e}")
-        message = "Failed to generate the statement. Please try again later."
-        message = await generate_response(message)
-        await update.message.reply_text(message)
+        await update.message.reply_text(await render_reply("statement_failed", language))
         
+@traced
+async def rebuild_balance(update: Update, context):
+    """Recompute the balance from the stored transactions."""
+    language = update.effective_user.language_code
+    if not await is_authorized(update.effective_user.id):
+        await update.message.reply_text(await render_reply("unauthorized", language))
+        return
+
+    try:
+        with stage("store"):
+            balance = await get_store().rebuild_balance(update.effective_user.id)
+        message = await render_reply(balance_template(balance), language, balance=balance)
+        await update.message.reply_text(message)
+    except Exception as e:
+        logging.error(f"Error rebuilding balance: {e}")
+        await update.message.reply_text(await render_reply("balance_failed", language))
+
+async def _set_allowed(update: Update, context, allowed: bool) -> None:
+    language = update.effective_user.language_code
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text(await render_reply("unauthorized", language))
+        return
+    try:
+        user_id = int(context.args[0])
+    except (IndexError, ValueError):
+        await update.message.reply_text(await render_reply("allow_usage", language))
+        return
+
+    try:
+        with stage("store"):
+            await set_allowed(user_id, allowed)
+    except NotImplementedError:
+        await update.message.reply_text(await render_reply("allowlist_unsupported", language))
+        return
+    except Exception as e:
+        logging.error(f"Error updating the allowlist: {e}")
+        await update.message.reply_text(await render_reply("unexpected_error", language))
+        return
+    logging.info("User %s %s user %s", update.effective_user.id, "allowed" if allowed else "disallowed", user_id)
+    await update.message.reply_text(await render_reply("user_allowed" if allowed else "user_disallowed", language, user_id=user_id))
+
+@traced
+async def allow_user(update: Update, context):
+    """Add a user to the allowlist. Admins only: /allow <user id>."""
+    await _set_allowed(update, context, True)
+
+@traced
+async def disallow_user(update: Update, context):
+    """Remove a user from the allowlist. Admins only: /disallow <user id>."""
+    await _set_allowed(update, context, False)
+
+@traced
+async def handle_document(update: Update, context: CallbackContext) -> None:
+    """Import transactions from an uploaded CSV or XLSX bank export."""
+    language = update.effective_user.language_code
+    if not await is_authorized(update.effective_user.id):
+        await update.message.reply_text(await render_reply("unauthorized", language))
+        return
+
+    document = update.message.document
+    try:
+        with stage("download"):
+            telegram_file = await document.get_file()
+            data = bytes(await telegram_file.download_as_bytearray())
+        with stage("parse"):
+            result = await asyncio.to_thread(parse_statement, data, document.file_name, update.effective_user.id)
+    except ValueError as ve:
+        await update.message.reply_text(await render_reply("import_failed", language, error=ve))
+        return
+    except Exception as e:
+        logging.error(f"Error reading import: {e}")
+        await update.message.reply_text(await render_reply("unexpected_error", language))
+        return
+
+    if not result.transactions:
+        await update.message.reply_text(await render_reply("import_empty", language))
+        return
+    try:
+        with stage("store"):
+            balance = await get_store().insert_transactions(result.transactions)
+        logging.info("Imported %d transactions for user %s", len(result.transactions), update.effective_user.id)
+        done = await render_reply("import_done", language, count=len(result.transactions), skipped=result.skipped)
+        message = await render_reply(balance_template(balance), language, balance=balance)
+        await update.message.reply_text(f"{done} {message}")
+    except Exception as e:
+        logging.error(f"Error storing import: {e}")
+        await update.message.reply_text(await render_reply("unexpected_error", language))
+
+
+@traced
 async def handle_message(update: Update, context: CallbackContext) -> None:
     """Handle messages from the user."""
-    if update.effective_user.id != AUTHORIZED_USER_ID:
-        await update.message.reply_text("Unauthorized access!")
+    language = update.effective_user.language_code
+    if not await is_authorized(update.effective_user.id):
+        await update.message.reply_text(await render_reply("unauthorized", language))
         return
 
     user_input = update.message.text
+    if not user_input:
+        # Photos, stickers and the like have no text to understand.
+        await update.message.reply_text(await render_reply("invalid_input", language))
+        return
     try:
-        # --- Extract Intent ---
-        intent = await get_intent(user_input)
+        # --- Extract Intent and Transaction Data ---
+        with stage("extract"):
+            extraction = extract_locally(user_input)
+        if extraction is None:
+            # Repeated questions are answered from the cache until the user's data changes.
+            # Only messages bound for Gemini are looked up: new transactions must always be stored.
+            with stage("answer_cache"):
+                key = await answer_key(update.effective_user.id, user_input)
+                cached = get_answer(key)
+            if cached is not None:
+                await update.message.reply_text(cached)
+                return
+            with stage("extract"):
+                extraction = await extract_with_gemini(user_input)
+        intent = extraction.intent
         logging.info("User Intent: %s", intent)
         
         if intent == "add_transaction":
-            gemini_output = get_transaction_data(user_input)
-            amount = gemini_output.get("amount")
-            account = gemini_output.get("account", "Other")
-            transaction_type = gemini_output.get("transaction_type", "Expense")
-            date = gemini_output.get("date", None)
-
-            if amount is None:
+            transactions = extraction.transactions
+            if not transactions or any(transaction.amount is None for transaction in transactions):
                 if "balance" in user_input.lower():
                     await get_balance(update, context)
                     return
@@ -202,119 +226,129 @@ async def handle_message(update: Update, context: CallbackContext) -> None:
                     await get_statement(update, context)
                     return
                 else:
-                    message = "I couldn't extract the amount from your input. Please try again."
-                    message = await generate_response(message)
-                    await update.message.reply_text(message)
+                    await update.message.reply_text(await render_reply("amount_missing", language))
                     return
 
-            date = datetime.strptime(date, '%Y-%m-%d') if date else datetime.now()
-            date_str = date.strftime('%Y-%m-%d')
-            income = float(amount) if transaction_type == "Income" else 0
-            expenditure = float(amount) if transaction_type == "Expense" else 0
-            remarks = user_input
-
-            finance_data = {
-                "date": date_str,
-                "account": account,
-                "income": income,
-                "expenditure": expenditure,
-                "remarks": remarks,
-                "user_id": update.effective_user.id
-            }
-
-            db = client.get_database("FinancesDB")  
-            finances_collection = db.get_collection("finances") 
-            finances_collection.insert_one(finance_data)
-            
-            message = "Entry added successfully!"
-            message = await generate_response(message)
-            await update.message.reply_text(message)
-
-            cursor = finances_collection.find({"user_id": update.effective_user.id})
-            records = list(cursor)
-            total_income = sum(record.get("income", 0) for record in records)
-            total_expenditure = sum(record.get("expenditure", 0) for record in records)
-            balance = total_income - total_expenditure
-            
-            message = f"Current Available Balance: {balance}"
-            message = await generate_response(message)
-            await update.message.reply_text(message)
+            # Every entry in the message is stored in one batch and answered with one reply.
+            now = datetime.now()
+            finance_data = []
+            for transaction in transactions:
+                amount = float(transaction.amount)
+                finance_data.append({
+                    "date": to_datetime(transaction.date or now),
+                    "account": transaction.account,
+                    "income": amount if transaction.transaction_type == "Income" else 0,
+                    "expenditure": amount if transaction.transaction_type == "Expense" else 0,
+                    "remarks": user_input,
+                    "user_id": update.effective_user.id
+                })
+
+            with stage("store"):
+                balance = await get_store().insert_transactions(finance_data)
+
+            if len(transactions) == 1:
+                added = await render_reply("entry_added", language)
+            else:
+                summary = ", ".join(
+                    f"{transaction.amount:g} {transaction.account} {transaction.transaction_type.lower()}"
+                    for transaction in transactions
+                )
+                added = await render_reply("entries_added", language, count=len(transactions), summary=summary)
+            message = await render_reply(balance_template(balance), language, balance=balance)
+            await update.message.reply_text(f"{added} {message}")
             
         elif intent == "get_balance":
             await get_balance(update, context)
         elif intent == "get_statement":
-            await get_statement(update, context)
+            query = extraction.query or AnalyticsQuery()
+            await get_statement(update, context, query.start_date, query.end_date)
         else:
             logging.info("User Query: %s", user_input)
-            db = client.get_database("FinancesDB")  
-            finances_collection = db.get_collection("finances") 
-            cursor = finances_collection.find({"user_id": update.effective_user.id})
-            records = list(cursor)
-            for record in records:
-                record.pop("_id")
-            json_data = json.dumps(records)
-            logging.info("Finance Data: %s", json_data)
-            message = await summarise_balance_data(user_input, json_data)  
+            with stage("analytics"):
+                results = await analytics.run_query(update.effective_user.id, extraction.query or AnalyticsQuery())
+            logging.info("Query Results: %s", results)
+            try:
+                with stage("summarise"):
+                    message = await summarise_balance_data(user_input, results)
+            except LLMUnavailable:
+                # The numbers are already computed; send them as they are rather than an error.
+                message = plain_summary(results)
+                if not message:
+                    raise
+                await update.message.reply_text(message)
+                return
             logging.info("Response: %s", message) 
+            set_answer(key, message)
             await update.message.reply_text(message)
+    except LLMUnavailable as e:
+        logging.warning(f"Gemini unavailable in handle_message: {e}")
+        await update.message.reply_text(await render_reply("llm_unavailable", language))
     except json.JSONDecodeError:
         logging.error("Gemini returned invalid JSON. Please rephrase your input.")
-        message = "Gemini returned invalid JSON. Please rephrase your input."
-        message = await generate_response(message)
-        await update.message.reply_text(message)
+        await update.message.reply_text(await render_reply("invalid_input", language))
     except ValueError as ve:
         logging.error(f"Error in handle_message: {ve}")
-        message = f"Error: {ve}"
-        message = await generate_response(message)
-        await update.message.reply_text(message)
+        await update.message.reply_text(await render_reply("error", language, error=ve))
     except Exception as e:
         logging.error(f"Error in handle_message: {e}")
-        message = f"An unexpected error occurred: {e}"
-        message = await generate_response(message)
-        await update.message.reply_text(message)
+        await update.message.reply_text(await render_reply("unexpected_error", language))
 
 
-def main():
+async def reply_dropped(update: Update) -> None:
+    """Ask the user to resend a message that was not handled because they sent too many at once."""
+    if update.effective_message is not None:
+        language = update.effective_user.language_code if update.effective_user else None
+        await update.effective_message.reply_text(await render_reply("too_many_messages", language))
+
+
+async def ping() -> bool:
+    return await get_store().ping()
+
+
+async def post_init(application: Application) -> None:
+    """Connect to the store, create its indexes and load the Gemini client once the event loop is running."""
+    await ping()
+    await get_store().ensure_indexes()
+    # Importing google.generativeai takes a while; doing it here in a thread keeps it off the event loop
+    # and out of the first user's reply.
+    await asyncio.to_thread(get_model)
+
+
+def build_application() -> Application:
     # Get Telegram token from environment variables
     TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
     if not TELEGRAM_TOKEN:
         raise ValueError("Please set the TELEGRAM_TOKEN environment variable.")
 
     # Create Application instance using the builder
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
-    
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        # Same pool size the builder uses by default; the subclass only adds timing.
+        .request(TimedRequest(connection_pool_size=256))
+        .concurrent_updates(PerUserUpdateProcessor(on_dropped=reply_dropped))
+        .post_init(post_init)
+        .build()
+    )
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("getstatement", get_statement))
     application.add_handler(CommandHandler("getbalance", get_balance))
+    application.add_handler(CommandHandler("rebuildbalance", rebuild_balance))
+    application.add_handler(CommandHandler("allow", allow_user))
+    application.add_handler(CommandHandler("disallow", disallow_user))
+    # Every upload goes to handle_document, which explains which file types it can import.
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
     application.add_handler(MessageHandler(filters.ALL, handle_message))
+    return application
 
-    # Start the bot
+
+def main():
+    # Start the bot. BOT_MODE=webhook serves updates over HTTP instead of polling,
+    # and STORAGE_BACKEND picks where transactions are kept (mongo, sqlite or sheets).
     print("Starting the bot...")
-    
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
-
-
-# @app.route('/health', methods=['GET'])
-# def health():
-#     return jsonify({"status": "ok"})
-
-# start = False
-# @app.route('/start', methods=['GET'])
-# def start_bot():
-#     global start
-#     if start:
-#         return jsonify({"status": "Bot already started"})
-#     start = True
-#     while start:
-#         main()
-        
-# @app.route('/stop', methods=['GET'])
-# def stop_bot():
-#     global start
-#     start = False
-#     return jsonify({"status": "ok"})
+    bot_server.run(build_application, readiness_checks=[ping])
+
 
 if __name__ == "__main__":
-    while True:
-        main()
\ No newline at end of file
+    main()
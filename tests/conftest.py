@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules live flat in the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# llm_client refuses to import without a key; tests never reach Gemini.
+os.environ.setdefault("GEMINI_API_KEY", "test")
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+
+import pytest
+
+from fast_parser import parse_transactions
+
+
+def parse_transaction(text):
+    parsed = parse_transactions(text)
+    assert parsed is None or len(parsed) == 1
+    return parsed[0] if parsed else None
+
+
+@pytest.mark.parametrize("text", [
+    "How much did I spend on food in 2025?",
+    "How much did I spend on groceries in the last 30 days?",
+    "Did I pay 500 for rent?",
+    "Did I receive 30000 salary this month?",
+    "paid 500 for rent?",
+    "show what I spent on food",
+])
+def test_questions_are_not_transactions(text):
+    assert parse_transaction(text) is None
+    assert parse_transactions(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "spent 500 on food in 2025",
+    "spent 1200 on groceries over the last 3 days",
+    "spent 500 on groceries on 5th March",
+    "paid 300 for cab 3rd of march",
+    "spent 500 on groceries on monday",
+    "spent 500 on groceries last week",
+    "spent 500 on groceries on the 5th",
+    "pay 500 for rent next week",
+    "spent 500 on groceries day before yesterday",
+    "spent 500 on groceries 2 days ago",
+])
+def test_unread_dates_are_left_to_gemini(text):
+    assert parse_transactions(text) is None
+
+
+def test_read_dates():
+    assert parse_transaction("spent 500 on groceries on 5 March 2025").date == date(2025, 3, 5)
+    assert parse_transaction("spent 500 on groceries on 2025-03-05").date == date(2025, 3, 5)
+    assert parse_transaction("spent 500 on groceries yesterday").date == date.today() - timedelta(days=1)
+    assert parse_transaction("spent 500 on groceries").date is None
+
+
+def test_amount_that_looks_like_a_year():
+    transaction = parse_transaction("paid 2000 for rent")
+    assert transaction.amount == 2000
+    assert transaction.transaction_type == "Expense"
+
+
+def test_simple_transactions():
+    assert parse_transaction("Spent 500 on groceries").amount == 500
+    income = parse_transaction("received 30000 salary")
+    assert (income.amount, income.account, income.transaction_type) == (30000, "Salary", "Income")
+
+
+def test_several_transactions():
+    parsed = parse_transactions("spent 1,200 on rent, paid 300 for a cab and got 5000 salary")
+    assert [(t.amount, t.account) for t in parsed] == [(1200, "Home"), (300, "Trips"), (5000, "Salary")]
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from llm_client import CircuitBreaker, LLMUnavailable, RateLimiter
+
+
+def open_breaker(reset_seconds: float) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=reset_seconds)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_threshold_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+
+def test_breaker_allows_a_single_probe():
+    breaker = open_breaker(reset_seconds=0)
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_breaker_closes_when_probe_succeeds():
+    breaker = open_breaker(reset_seconds=0)
+    assert breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_breaker_reopens_when_probe_fails():
+    breaker = open_breaker(reset_seconds=0)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open
+    breaker.reset_seconds = 60
+    assert not breaker.allow()
+
+
+def test_acquire_waits_within_deadline():
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=1_000_000)
+    limiter.requests.take(limiter.requests.capacity)
+    asyncio.run(limiter.acquire(tokens=10, timeout=1))
+
+
+def test_acquire_raises_when_wait_passes_deadline():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1_000_000)
+    limiter.requests.take(limiter.requests.capacity)
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(limiter.acquire(tokens=10, timeout=0.1))
+
+
+def test_acquire_raises_when_tokens_run_out():
+    limiter = RateLimiter(requests_per_minute=1_000_000, tokens_per_minute=600)
+    limiter.tokens.take(limiter.tokens.capacity)
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(limiter.acquire(tokens=100, timeout=0.1))
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+import replies
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    replies.paraphrase_cache.clear()
+
+
+def paraphrase_with(monkeypatch, text):
+    async def generate_text(prompt, **kwargs):
+        if isinstance(text, Exception):
+            raise text
+        return text
+
+    monkeypatch.setattr(replies, "generate_text", generate_text)
+
+
+def test_render_reply_uses_paraphrase(monkeypatch):
+    paraphrase_with(monkeypatch, "Importé {count} transactions, {skipped} ignorées.")
+    reply = asyncio.run(replies.render_reply("import_done", "fr", count=3, skipped=1))
+    assert reply == "Importé 3 transactions, 1 ignorées."
+
+
+@pytest.mark.parametrize("paraphrased", [
+    "Importé {count} transactions.",
+    "Importé {count} transactions, {skipped} ignorées {.",
+    "Importé {count:d} transactions, {skipped} ignorées.",
+    RuntimeError("Gemini is down"),
+])
+def test_render_reply_falls_back_to_template(monkeypatch, paraphrased):
+    paraphrase_with(monkeypatch, paraphrased)
+    reply = asyncio.run(replies.render_reply("import_done", "fr", count=3, skipped=1))
+    assert reply == "Imported 3 transactions (1 rows skipped)."
+    assert replies.paraphrase_cache.get(("import_done", "fr")) == replies.TEMPLATES["import_done"]
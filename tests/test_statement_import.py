@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+
+from statement_import import parse_amount, parse_statement
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Rs. 300", 300),
+    ("Rs.300", 300),
+    ("INR 1,234.50", 1234.5),
+    ("₹ 99.99", 99.99),
+    ("1,234.50", 1234.5),
+    ("(200)", -200),
+    ("-75", -75),
+    (450, 450),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value", ["", None, "n/a"])
+def test_parse_amount_empty(value):
+    assert parse_amount(value) is None
+
+
+def test_month_first_file_uses_one_date_format():
+    data = (
+        "Date,Description,Amount\n"
+        "04/25/2025,Groceries,-500\n"
+        "04/03/2025,Rent,-12000\n"
+        "05/01/2025,Salary,30000\n"
+    ).encode()
+    result = parse_statement(data, "export.csv", user_id=1)
+    assert [t["date"] for t in result.transactions] == [
+        datetime(2025, 4, 25), datetime(2025, 4, 3), datetime(2025, 5, 1),
+    ]
+
+
+def test_day_first_file():
+    data = "Date,Description,Amount\n25/04/2025,Groceries,-500\n03/04/2025,Rent,-12000\n".encode()
+    result = parse_statement(data, "export.csv", user_id=1)
+    assert [t["date"] for t in result.transactions] == [datetime(2025, 4, 25), datetime(2025, 4, 3)]
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime
+
+from telegram import Chat, Message, Update, User
+
+from update_processor import PerUserUpdateProcessor
+
+
+def make_update(update_id: int, user_id: int) -> Update:
+    message = Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(user_id, Chat.PRIVATE),
+        from_user=User(user_id, "Test", False), text="hi",
+    )
+    return Update(update_id, message=message)
+
+
+def test_same_user_updates_finish_in_arrival_order():
+    finished = []
+
+    async def handle(update_id, delay):
+        await asyncio.sleep(delay)
+        finished.append(update_id)
+
+    async def main():
+        processor = PerUserUpdateProcessor(max_workers=4)
+        # Earlier updates take longer, so only ordering makes them finish first.
+        await asyncio.gather(*(
+            processor.process_update(make_update(update_id, 1), handle(update_id, 0.03 - update_id * 0.01))
+            for update_id in range(3)
+        ))
+
+    asyncio.run(main())
+    assert finished == [0, 1, 2]
+
+
+def test_different_users_run_in_parallel():
+    running = set()
+
+    async def main():
+        # Each handler waits until both are running, so running them one after the other times out.
+        overlap = asyncio.Event()
+
+        async def handle(user_id):
+            running.add(user_id)
+            if len(running) == 2:
+                overlap.set()
+            await asyncio.wait_for(overlap.wait(), timeout=1)
+
+        processor = PerUserUpdateProcessor(max_workers=4)
+        await asyncio.gather(
+            processor.process_update(make_update(1, 1), handle(1)),
+            processor.process_update(make_update(2, 2), handle(2)),
+        )
+
+    asyncio.run(main())
+    assert running == {1, 2}
+
+
+def test_updates_over_the_user_limit_are_dropped():
+    dropped = []
+    handled = []
+
+    async def on_dropped(update):
+        dropped.append(update.update_id)
+
+    async def handle(update_id):
+        await asyncio.sleep(0.01)
+        handled.append(update_id)
+
+    async def main():
+        processor = PerUserUpdateProcessor(max_workers=4, max_pending_per_user=2, on_dropped=on_dropped)
+        await asyncio.gather(*(
+            processor.process_update(make_update(update_id, 1), handle(update_id)) for update_id in range(3)
+        ))
+
+    asyncio.run(main())
+    assert handled == [0, 1]
+    assert dropped == [2]
@@ -0,0 +1,126 @@
+"""Train the local intent classifier and evaluate it against Gemini's labels.
+
+Training data is the labelled message log (INTENT_LOG_PATH) plus a few seed
+examples per intent. For evaluation a fixed fifth of the messages Gemini
+labelled is held out; the report shows accuracy, how many messages clear the
+confidence threshold (and so skip Gemini), accuracy on those, per-intent
+recall and prediction time. The model is then trained on everything and
+saved to INTENT_MODEL_PATH.
+
+Usage:
+    python train_intent_classifier.py [--log intent_log.jsonl] [--threshold 0.8] [--no-save]
+"""
+from collections import Counter
+import argparse
+import json
+import logging
+import time
+import zlib
+
+from intent_classifier import (INTENT_CONFIDENCE_THRESHOLD, INTENT_LOG_BACKUPS, INTENT_LOG_PATH, INTENT_MODEL_PATH,
+                               IntentClassifier)
+
+logging.basicConfig(level=logging.INFO)
+
+SEED_EXAMPLES = [
+    ("What is my current balance?", "get_balance"),
+    ("balance", "get_balance"),
+    ("show my balance", "get_balance"),
+    ("how much money do I have left", "get_balance"),
+    ("what's left in my account", "get_balance"),
+    ("send me my statement", "get_statement"),
+    ("statement please", "get_statement"),
+    ("give me the statement for this month", "get_statement"),
+    ("I need a pdf of my transactions", "get_statement"),
+    ("Give me the statement for February 2025", "get_statement"),
+    ("Spent 500 on groceries", "add_transaction"),
+    ("paid 1200 for electricity", "add_transaction"),
+    ("received 30000 salary", "add_transaction"),
+    ("bought a shirt for 800", "add_transaction"),
+    ("got 5000 from freelance work", "add_transaction"),
+    ("Where did I spend the most?", "general_inquiry"),
+    ("How much did I spend on Trips this month?", "general_inquiry"),
+    ("How much did I spend on 25 January 2025?", "general_inquiry"),
+    ("hello", "general_inquiry"),
+    ("who created you?", "general_inquiry"),
+]
+
+
+def load_log(path: str) -> list:
+    """Return (text, intent, source) triples, keeping the latest label of each message.
+
+    Rotated logs (path.1 and up, oldest last) are read too, oldest first.
+    """
+    labels = {}
+    paths = [f"{path}.{index}" for index in range(INTENT_LOG_BACKUPS, 0, -1)] + [path]
+    found = False
+    for log_path in paths:
+        try:
+            with open(log_path) as f:
+                found = True
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        labels[entry["text"]] = (entry["intent"], entry.get("source", "llm"))
+        except FileNotFoundError:
+            continue
+    if not found:
+        logging.warning("No intent log at %s, training on the seed examples only.", path)
+    return [(text, intent, source) for text, (intent, source) in labels.items()]
+
+
+def is_held_out(text: str) -> bool:
+    # A hash, not a random split, so the same messages are held out on every run.
+    return zlib.crc32(text.encode()) % 5 == 0
+
+
+def evaluate(classifier: IntentClassifier, examples: list, threshold: float) -> None:
+    if not examples:
+        print("No held-out Gemini labels to evaluate against yet.")
+        return
+    correct = confident = confident_correct = 0
+    per_intent = Counter()
+    per_intent_correct = Counter()
+    started = time.perf_counter()
+    predictions = [classifier.predict(text) for text, _ in examples]
+    elapsed = time.perf_counter() - started
+    for (text, expected), (predicted, confidence) in zip(examples, predictions):
+        per_intent[expected] += 1
+        if predicted == expected:
+            correct += 1
+            per_intent_correct[expected] += 1
+        if confidence >= threshold:
+            confident += 1
+            confident_correct += predicted == expected
+
+    total = len(examples)
+    print(f"Held-out messages labelled by Gemini: {total}")
+    print(f"Accuracy: {correct / total:.1%}")
+    print(f"Above threshold {threshold}: {confident / total:.1%} of messages, "
+          f"{confident_correct / confident if confident else 0:.1%} accurate")
+    for intent in sorted(per_intent):
+        print(f"  {intent:<16} recall {per_intent_correct[intent] / per_intent[intent]:.1%} ({per_intent[intent]} messages)")
+    print(f"Prediction time: {elapsed / total * 1e6:.0f} us per message")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=INTENT_LOG_PATH or "intent_log.jsonl")
+    parser.add_argument("--threshold", type=float, default=INTENT_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--no-save", action="store_true", help="Only evaluate; do not write the model.")
+    args = parser.parse_args()
+
+    logged = load_log(args.log)
+    held_out = [(text, intent) for text, intent, source in logged if source == "llm" and is_held_out(text)]
+    held_out_texts = {text for text, _ in held_out}
+    training = SEED_EXAMPLES + [(text, intent) for text, intent, _ in logged if text not in held_out_texts]
+    evaluate(IntentClassifier.train(training), held_out, args.threshold)
+
+    if not args.no_save:
+        classifier = IntentClassifier.train(SEED_EXAMPLES + [(text, intent) for text, intent, _ in logged])
+        classifier.save(INTENT_MODEL_PATH)
+        print(f"Saved the model trained on {len(SEED_EXAMPLES) + len(logged)} messages to {INTENT_MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
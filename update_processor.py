@@ -0,0 +1,98 @@
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+import asyncio
+import logging
+import os
+import weakref
+
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "16"))
+# Updates accepted but not yet running, e.g. queued behind the same user's previous message.
+BOT_MAX_PENDING_UPDATES = int(os.getenv("BOT_MAX_PENDING_UPDATES", "256"))
+# Updates one user may have accepted at once; more are dropped so one user cannot fill every pending slot.
+BOT_MAX_PENDING_PER_USER = int(os.getenv("BOT_MAX_PENDING_PER_USER", "32"))
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently while keeping each user's updates in order.
+
+    Updates from different users run in parallel, up to max_workers at once.
+    Updates from the same user wait for the previous one to finish, so an
+    added transaction is always stored before a following balance request
+    is answered. A waiting update does not occupy a worker slot.
+
+    A waiting update does hold one of the max_pending slots, so each user
+    may have at most max_pending_per_user updates accepted at once. Further
+    updates from that user are not handled until their backlog drains, which
+    keeps one flooding user from stalling everybody else; on_dropped is
+    called with each of them, so the user can be asked to send it again.
+
+    Args:
+        max_workers: The maximum number of updates handled at the same time.
+        max_pending: The maximum number of updates accepted at once, including
+            those waiting for their user's previous update.
+        max_pending_per_user: The maximum number of updates accepted at once
+            from one user.
+        on_dropped: Optional coroutine function called with each update that
+            was not handled.
+    """
+
+    def __init__(self, max_workers: int = BOT_CONCURRENT_UPDATES, max_pending: int = BOT_MAX_PENDING_UPDATES,
+                 max_pending_per_user: int = BOT_MAX_PENDING_PER_USER, on_dropped=None):
+        super().__init__(max_concurrent_updates=max(max_pending, max_workers))
+        self.max_workers = max_workers
+        self.max_pending_per_user = max_pending_per_user
+        self.on_dropped = on_dropped
+        self._workers = asyncio.Semaphore(max_workers)
+        self._pending = {}
+        # Locks disappear once no update of that user is running or waiting.
+        self._locks = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def _key_for(update: object):
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    def _lock_for(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        key = self._key_for(update)
+        if key is None:
+            async with self._workers:
+                await coroutine
+            return
+        if self._pending.get(key, 0) >= self.max_pending_per_user:
+            logging.warning("Dropping update %s: user %s already has %d updates pending",
+                            getattr(update, "update_id", None), key, self.max_pending_per_user)
+            coroutine.close()
+            if self.on_dropped is not None:
+                try:
+                    await self.on_dropped(update)
+                except Exception as e:
+                    logging.error(f"Error replying to dropped update: {e}")
+            return
+        self._pending[key] = self._pending.get(key, 0) + 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, which is the order updates arrived in.
+            async with self._lock_for(key):
+                async with self._workers:
+                    await coroutine
+        finally:
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass